@@ -13,6 +13,9 @@ interface ProductImage {
     id: number;
     url: string;
     is_primary: boolean;
+    // Resized copies; null until the background resize has finished
+    thumbnail_url?: string | null;
+    medium_url?: string | null;
 }
 
 interface Product {
@@ -46,11 +49,18 @@ interface Review {
     created_at: string;
 }
 
+const ADMIN_PAGE_SIZE = 50;
+
 export default function AdminDashboard() {
     const [activeTab, setActiveTab] = useState<'products' | 'users' | 'reviews' | 'blocks' | 'categories'>('products');
     const [products, setProducts] = useState<Product[]>([]);
+    const [productsCursor, setProductsCursor] = useState<string | null>(null);
     const [users, setUsers] = useState<User[]>([]);
     const [reviews, setReviews] = useState<Review[]>([]);
+    // Cursor for the next page of each listing; null once everything is loaded
+    const [usersCursor, setUsersCursor] = useState<string | null>(null);
+    const [reviewsCursor, setReviewsCursor] = useState<string | null>(null);
+    const [totals, setTotals] = useState<{ users?: number; reviews?: number }>({});
     const [categories, setCategories] = useState<Category[]>([]);
     const [isAdmin, setIsAdmin] = useState(false);
 
@@ -97,22 +107,67 @@ export default function AdminDashboard() {
 
     const fetchData = async () => {
         try {
-            const [pRes, uRes, rRes, cRes] = await Promise.all([
-                fetch('/api/catalog/products'),
-                fetch('/api/auth/users'),
-                fetch('/api/feedback/reviews'),
-                fetch('/api/catalog/categories')
+            // Users and reviews load one page at a time; the summaries carry the totals
+            const [pRes, uRes, rRes, cRes, usRes, rsRes] = await Promise.all([
+                fetch(`/api/catalog/products?limit=${ADMIN_PAGE_SIZE}`),
+                fetch(`/api/auth/admin/users?limit=${ADMIN_PAGE_SIZE}`),
+                fetch(`/api/feedback/admin/reviews?limit=${ADMIN_PAGE_SIZE}`),
+                fetch('/api/catalog/categories'),
+                fetch('/api/auth/admin/summary'),
+                fetch('/api/feedback/admin/summary')
             ]);
-            if (pRes.ok) setProducts(await pRes.json());
-            if (uRes.ok) setUsers(await uRes.json());
-            if (rRes.ok) setReviews(await rRes.json());
+            if (pRes.ok) {
+                setProducts(await pRes.json());
+                setProductsCursor(pRes.headers.get('X-Next-Cursor'));
+            }
+            if (uRes.ok) {
+                setUsers(await uRes.json());
+                setUsersCursor(uRes.headers.get('X-Next-Cursor'));
+            }
+            if (rRes.ok) {
+                setReviews(await rRes.json());
+                setReviewsCursor(rRes.headers.get('X-Next-Cursor'));
+            }
             if (cRes.ok) setCategories(await cRes.json());
+            const userSummary = usRes.ok ? await usRes.json() : {};
+            const reviewSummary = rsRes.ok ? await rsRes.json() : {};
+            setTotals({ users: userSummary.users, reviews: reviewSummary.reviews });
         } catch (error) {
             console.error("Error fetching admin data", error);
         }
     };
 
 
+    const loadMoreProducts = async () => {
+        if (!productsCursor) return;
+        const res = await fetch(`/api/catalog/products?limit=${ADMIN_PAGE_SIZE}&cursor=${productsCursor}`);
+        if (res.ok) {
+            const page: Product[] = await res.json();
+            setProducts(prev => [...prev, ...page]);
+            setProductsCursor(res.headers.get('X-Next-Cursor'));
+        }
+    };
+
+    const loadMoreUsers = async () => {
+        if (!usersCursor) return;
+        const res = await fetch(`/api/auth/admin/users?limit=${ADMIN_PAGE_SIZE}&cursor=${usersCursor}`);
+        if (res.ok) {
+            const page: User[] = await res.json();
+            setUsers(prev => [...prev, ...page]);
+            setUsersCursor(res.headers.get('X-Next-Cursor'));
+        }
+    };
+
+    const loadMoreReviews = async () => {
+        if (!reviewsCursor) return;
+        const res = await fetch(`/api/feedback/admin/reviews?limit=${ADMIN_PAGE_SIZE}&cursor=${reviewsCursor}`);
+        if (res.ok) {
+            const page: Review[] = await res.json();
+            setReviews(prev => [...prev, ...page]);
+            setReviewsCursor(res.headers.get('X-Next-Cursor'));
+        }
+    };
+
     const resetProductForm = () => {
         setEditingProduct(null);
         setName("");
@@ -147,11 +202,11 @@ export default function AdminDashboard() {
                 if (selectedFiles.length > 0) {
                     setUploading(true);
                     for (const file of selectedFiles) {
-                        const formData = new FormData();
-                        formData.append('file', file);
+                        // Sent as the raw body so the server streams it straight to disk
                         await fetch(`/api/catalog/products/${savedProduct.id}/images/upload`, {
                             method: 'POST',
-                            body: formData
+                            headers: { 'Content-Type': file.type || 'application/octet-stream' },
+                            body: file
                         });
                     }
                     setUploading(false);
@@ -187,30 +242,42 @@ export default function AdminDashboard() {
 
     const handleBlockDates = async (e: React.FormEvent) => {
         e.preventDefault();
-        const res = await fetch('/api/rental/blocks', {
+        // "category:<name>" blocks every product in that category in one bulk request
+        const productIds = blockProductId.startsWith('category:')
+            ? products.filter(p => p.category === blockProductId.slice('category:'.length)).map(p => p.id)
+            : [parseInt(blockProductId)];
+        if (productIds.length === 0) {
+            alert("No products in this category.");
+            return;
+        }
+        const res = await fetch('/api/rental/blocks/bulk', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
-                product_id: parseInt(blockProductId),
-                start_date: blockStart,
-                end_date: blockEnd
+                blocks: productIds.map(id => ({ product_id: id, start_date: blockStart, end_date: blockEnd }))
             })
         });
         if (res.ok) {
-            alert("Dates Blocked!");
+            const report = await res.json();
+            alert(report.failed
+                ? `Blocked ${report.created} item(s); ${report.failed} already booked or blocked for these dates.`
+                : "Dates Blocked!");
             setBlockStart("");
             setBlockEnd("");
         }
     };
 
+    // Review edits are checked against the signed-in user (admins may change any review)
+    const authHeaders = () => ({ 'Authorization': `Bearer ${localStorage.getItem('token')}` });
+
     const handleRevertReview = async (id: number) => {
-        const res = await fetch(`/api/feedback/reviews/${id}/revert`, { method: 'POST' });
+        const res = await fetch(`/api/feedback/reviews/${id}/revert`, { method: 'POST', headers: authHeaders() });
         if (res.ok) fetchData();
     };
 
     const handleDeleteReview = async (id: number) => {
         if (!confirm("Delete this review?")) return;
-        const res = await fetch(`/api/feedback/reviews/${id}`, { method: 'DELETE' });
+        const res = await fetch(`/api/feedback/reviews/${id}`, { method: 'DELETE', headers: authHeaders() });
         if (res.ok) fetchData();
     };
 
@@ -224,7 +291,7 @@ export default function AdminDashboard() {
 
         const res = await fetch(`/api/feedback/reviews/${r.id}`, {
             method: 'PATCH',
-            headers: { 'Content-Type': 'application/json' },
+            headers: { 'Content-Type': 'application/json', ...authHeaders() },
             body: JSON.stringify({ comment: newComment, rating: newRating })
         });
         if (res.ok) fetchData();
@@ -290,6 +357,8 @@ export default function AdminDashboard() {
                             className={`flex-1 py-3 px-4 rounded-xl text-sm font-black capitalize transition-all duration-300 ${activeTab === tab ? 'bg-indigo-600 text-white shadow-lg shadow-indigo-100' : 'text-slate-500 hover:text-slate-900'}`}
                         >
                             {tab}
+                            {tab === 'users' && totals.users !== undefined && ` (${totals.users})`}
+                            {tab === 'reviews' && totals.reviews !== undefined && ` (${totals.reviews})`}
                         </button>
                     ))}
                 </div>
@@ -330,7 +399,7 @@ export default function AdminDashboard() {
                                         <div className="flex flex-wrap gap-2 mb-2">
                                             {editingProduct?.images.map(img => (
                                                 <div key={img.id} className="relative group w-16 h-16 rounded-lg overflow-hidden border border-slate-200">
-                                                    <img src={img.url} className="w-full h-full object-cover" />
+                                                    <img src={img.thumbnail_url || img.url} className="w-full h-full object-cover" />
                                                     <button 
                                                         type="button"
                                                         onClick={async () => {
@@ -409,14 +478,14 @@ export default function AdminDashboard() {
                             <div className="bg-white p-8 rounded-[32px] shadow-sm border border-slate-200">
                                 <div className="flex items-center justify-between mb-8">
                                     <h2 className="text-2xl font-black text-slate-900 tracking-tight">Live Inventory</h2>
-                                    <span className="bg-slate-100 text-slate-500 px-3 py-1 rounded-full text-xs font-black">{products.length} Items</span>
+                                    <span className="bg-slate-100 text-slate-500 px-3 py-1 rounded-full text-xs font-black">{products.length}{productsCursor ? '+' : ''} Items</span>
                                 </div>
                                 <div className="space-y-4 max-h-[800px] overflow-y-auto pr-2 no-scrollbar">
                                     {products.map(p => (
                                         <div key={p.id} className="p-5 bg-slate-50 rounded-2xl flex items-center justify-between group hover:bg-white hover:shadow-lg hover:shadow-slate-100 transition-all duration-300 border border-transparent hover:border-slate-100">
                                             <div className="flex items-center space-x-4">
                                                 <div className="w-14 h-14 bg-white rounded-xl overflow-hidden border border-slate-100 flex-shrink-0">
-                                                    <img src={p.images?.[0]?.url || "https://dummyimage.com/200x200/fff/ccc&text=P"} className="w-full h-full object-cover" />
+                                                    <img src={p.images?.[0]?.thumbnail_url || p.images?.[0]?.url || "https://dummyimage.com/200x200/fff/ccc&text=P"} className="w-full h-full object-cover" />
                                                 </div>
                                                 <div>
                                                     <p className="font-black text-slate-900 leading-tight">{p.name}</p>
@@ -433,6 +502,9 @@ export default function AdminDashboard() {
                                             </div>
                                         </div>
                                     ))}
+                                    {productsCursor && (
+                                        <button onClick={loadMoreProducts} className="w-full py-3 bg-slate-50 text-slate-900 rounded-2xl font-black text-xs uppercase tracking-widest hover:bg-slate-100 transition-colors">Load more</button>
+                                    )}
                                 </div>
                             </div>
                         </div>
@@ -472,6 +544,11 @@ export default function AdminDashboard() {
                                 </tbody>
                             </table>
                         </div>
+                        {usersCursor && (
+                            <div className="p-6 border-t border-slate-100 text-center">
+                                <button onClick={loadMoreUsers} className="px-6 py-3 bg-slate-50 text-slate-900 rounded-2xl font-black text-xs uppercase tracking-widest hover:bg-slate-100 transition-colors">Load more</button>
+                            </div>
+                        )}
                     </div>
                 )}
 
@@ -518,6 +595,11 @@ export default function AdminDashboard() {
                                 <p className="text-slate-400 font-black uppercase tracking-[0.3em] text-xs">Awaiting client feedback</p>
                             </div>
                         )}
+                        {reviewsCursor && (
+                            <div className="text-center">
+                                <button onClick={loadMoreReviews} className="px-6 py-3 bg-white text-slate-900 rounded-2xl border border-slate-200 font-black text-xs uppercase tracking-widest hover:bg-slate-100 transition-colors">Load more</button>
+                            </div>
+                        )}
                     </div>
                 )}
 
@@ -533,7 +615,12 @@ export default function AdminDashboard() {
                                     <label className="text-[10px] font-black uppercase tracking-widest text-slate-400 ml-2">Target Product</label>
                                     <select value={blockProductId} onChange={e => setBlockProductId(e.target.value)} className="w-full p-5 bg-slate-50 border border-slate-100 rounded-[24px] focus:ring-4 focus:ring-indigo-50 outline-none font-bold text-slate-900 appearance-none text-lg" required>
                                         <option value="">Locate entry...</option>
-                                        {products.map(p => <option key={p.id} value={p.id}>{p.name} (SKU-{p.id})</option>)}
+                                        <optgroup label="Whole category">
+                                            {categories.map(cat => <option key={`category-${cat.id}`} value={`category:${cat.name}`}>{cat.name} (all items)</option>)}
+                                        </optgroup>
+                                        <optgroup label="Single product">
+                                            {products.map(p => <option key={p.id} value={p.id}>{p.name} (SKU-{p.id})</option>)}
+                                        </optgroup>
                                     </select>
                                 </div>
                                 <div className="grid grid-cols-1 sm:grid-cols-2 gap-6">
@@ -8,13 +8,29 @@ interface Product {
     id: number;
     name: string;
     category: string;
-    images: { id: number; url: string; is_primary: boolean }[];
+    images: { id: number; url: string; is_primary: boolean; thumbnail_url?: string | null; medium_url?: string | null }[];
     price_1_day: number;
     available: boolean;
 }
 
+const PAGE_SIZE = 24;
+
+// Only what the grid shows, and only the primary image
+const listingUrl = (category: string, cursor?: string | null) => {
+    const params = new URLSearchParams({
+        limit: String(PAGE_SIZE),
+        fields: 'name,category,price_1_day,available,images',
+        images: 'primary',
+    });
+    if (category !== "All") params.set('category', category);
+    if (cursor) params.set('cursor', cursor);
+    return `/api/catalog/products?${params}`;
+};
+
 export default function Catalog() {
     const [products, setProducts] = useState<Product[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [categories, setCategories] = useState<string[]>(["All"]);
     const [selectedCategory, setSelectedCategory] = useState("All");
     const [loading, setLoading] = useState(true);
@@ -30,15 +46,12 @@ export default function Catalog() {
                     setCategories(["All", ...cData.map((c: any) => c.name)]);
                 }
 
-                // Fetch Products
-                let url = '/api/catalog/products';
-                if (selectedCategory !== "All") {
-                    url += `?category=${selectedCategory}`;
-                }
-                const pRes = await fetch(url);
+                // Fetch the first page of products
+                const pRes = await fetch(listingUrl(selectedCategory));
                 if (pRes.ok) {
                     const pData = await pRes.json();
                     setProducts(pData);
+                    setNextCursor(pRes.headers.get('X-Next-Cursor'));
                 }
             } catch (error) {
                 console.error("Failed to fetch data", error);
@@ -50,6 +63,21 @@ export default function Catalog() {
         fetchData();
     }, [selectedCategory]);
 
+    const loadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const res = await fetch(listingUrl(selectedCategory, nextCursor));
+            if (res.ok) {
+                const page: Product[] = await res.json();
+                setProducts(prev => [...prev, ...page]);
+                setNextCursor(res.headers.get('X-Next-Cursor'));
+            }
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
 
     return (
         <div className="bg-white min-h-screen">
@@ -93,6 +121,14 @@ export default function Catalog() {
                                 <ProductCard key={product.id} product={product} />
                             ))}
                         </div>
+
+                        {nextCursor && (
+                            <div className="text-center mt-16">
+                                <button onClick={loadMore} disabled={loadingMore} className="px-8 py-4 bg-slate-900 text-white rounded-full font-black text-xs uppercase tracking-widest hover:bg-indigo-600 transition-colors disabled:opacity-50">
+                                    {loadingMore ? 'Loading...' : 'Show more'}
+                                </button>
+                            </div>
+                        )}
                         
                         {products.length === 0 && (
                             <div className="text-center py-32">
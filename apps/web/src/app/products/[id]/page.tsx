@@ -12,6 +12,9 @@ interface ProductImage {
     id: number;
     url: string;
     is_primary: boolean;
+    // Resized copies; null until the background resize has finished
+    thumbnail_url?: string | null;
+    medium_url?: string | null;
 }
 
 interface Product {
@@ -35,11 +38,15 @@ interface Review {
     created_at: string;
 }
 
+const REVIEWS_PAGE_SIZE = 10;
+
 export default function ProductDetails() {
     const { id } = useParams();
     const router = useRouter();
     const [product, setProduct] = useState<Product | null>(null);
     const [reviews, setReviews] = useState<Review[]>([]);
+    const [reviewsCursor, setReviewsCursor] = useState<string | null>(null);
+    const [rating, setRating] = useState<{ count: number; average: number | null } | null>(null);
     const [bookedDates, setBookedDates] = useState<Date[]>([]);
     const [loading, setLoading] = useState(true);
     const [isLoggedIn, setIsLoggedIn] = useState(false);
@@ -53,6 +60,31 @@ export default function ProductDetails() {
 
 
     
+    const fetchReviews = async () => {
+        const [rRes, aRes] = await Promise.all([
+            fetch(`/api/feedback/reviews/${id}?limit=${REVIEWS_PAGE_SIZE}`),
+            fetch(`/api/feedback/ratings?product_ids=${id}`)
+        ]);
+        if (rRes.ok) {
+            setReviews(await rRes.json());
+            setReviewsCursor(rRes.headers.get('X-Next-Cursor'));
+        }
+        if (aRes.ok) {
+            const [aggregate] = await aRes.json();
+            setRating(aggregate);
+        }
+    };
+
+    const loadMoreReviews = async () => {
+        if (!reviewsCursor) return;
+        const res = await fetch(`/api/feedback/reviews/${id}?limit=${REVIEWS_PAGE_SIZE}&cursor=${reviewsCursor}`);
+        if (res.ok) {
+            const page: Review[] = await res.json();
+            setReviews(prev => [...prev, ...page]);
+            setReviewsCursor(res.headers.get('X-Next-Cursor'));
+        }
+    };
+
     useEffect(() => {
         const token = localStorage.getItem('token');
         setIsLoggedIn(!!token);
@@ -61,7 +93,7 @@ export default function ProductDetails() {
         if (token) {
             try {
                 const payload = JSON.parse(atob(token.split('.')[1]));
-                currentUserId = payload.sub || payload.user_id;
+                currentUserId = payload.user_id || payload.sub;
             } catch (e) {}
         }
 
@@ -71,14 +103,12 @@ export default function ProductDetails() {
                 const pRes = await fetch(`/api/catalog/products/${id}`);
                 if (pRes.ok) setProduct(await pRes.json());
 
-                // Fetch Reviews & check if user already reviewed
-                const rRes = await fetch(`/api/feedback/reviews/${id}`);
-                if (rRes.ok) {
-                    const rData: Review[] = await rRes.json();
-                    setReviews(rData);
-                    if (currentUserId) {
-                        setHasReviewed(rData.some(r => r.user_id === currentUserId));
-                    }
+                // Fetch the first page of reviews and the rating totals
+                await fetchReviews();
+                // Check if user already reviewed
+                if (currentUserId) {
+                    const oRes = await fetch(`/api/feedback/reviews/${id}?user_id=${currentUserId}&limit=1`);
+                    if (oRes.ok) setHasReviewed((await oRes.json()).length > 0);
                 }
 
                 // Fetch Availability
@@ -86,7 +116,15 @@ export default function ProductDetails() {
                     const aRes = await fetch(`/api/rental/availability/${id}`);
                     if (aRes.ok) {
                         const availability = await aRes.json();
-                        setBookedDates(availability.booked_dates.map((d: string) => new Date(d)));
+                        // Busy periods come back as merged intervals; expand them for the calendar
+                        const days: Date[] = [];
+                        for (const interval of availability.busy as { start: string; end: string }[]) {
+                            const end = new Date(interval.end);
+                            for (let d = new Date(interval.start); d <= end; d.setUTCDate(d.getUTCDate() + 1)) {
+                                days.push(new Date(d));
+                            }
+                        }
+                        setBookedDates(days);
                         setAvailabilityError(false);
                     } else {
                         setAvailabilityError(true);
@@ -182,8 +220,7 @@ export default function ProductDetails() {
                 setShowReviewForm(false);
                 setHasReviewed(true); // Update local state immediately
                 // Refresh reviews
-                const rRes = await fetch(`/api/feedback/reviews/${id}`);
-                if (rRes.ok) setReviews(await rRes.json());
+                await fetchReviews();
             } else {
                 const err = await res.json();
                 alert(err.detail || "Failed to submit review");
@@ -228,7 +265,7 @@ export default function ProductDetails() {
                         <div className="sticky top-28 space-y-4">
                             <div className="relative rounded-3xl overflow-hidden bg-slate-50 border border-slate-100 shadow-2xl shadow-slate-100 group">
                                 <img
-                                    src={product.images?.[activeImageIndex]?.url || "https://dummyimage.com/1200x1600/f8fafc/64748b&text=Designer+Wear"}
+                                    src={product.images?.[activeImageIndex]?.medium_url || product.images?.[activeImageIndex]?.url || "https://dummyimage.com/1200x1600/f8fafc/64748b&text=Designer+Wear"}
                                     alt={product.name}
                                     className="w-full h-full object-center object-cover aspect-[3/4] transition-all duration-700 hover:scale-105"
                                 />
@@ -265,7 +302,7 @@ export default function ProductDetails() {
                                             onClick={() => setActiveImageIndex(idx)}
                                             className={`relative flex-shrink-0 w-20 h-20 rounded-xl overflow-hidden border-2 transition-all ${activeImageIndex === idx ? 'border-indigo-600' : 'border-transparent opacity-60 hover:opacity-100'}`}
                                         >
-                                            <img src={img.url} className="w-full h-full object-cover" />
+                                            <img src={img.thumbnail_url || img.url} className="w-full h-full object-cover" />
                                         </button>
                                     ))}
                                 </div>
@@ -335,10 +372,13 @@ export default function ProductDetails() {
                             <div className="mt-20 pt-20 border-t border-slate-100">
                                 <div className="flex items-center justify-between mb-10">
                                     <h3 className="text-2xl font-black text-slate-900 tracking-tight leading-none">Community Reviews</h3>
-                                    <div className="flex items-center bg-yellow-50 px-4 py-2 rounded-full border border-yellow-100">
-                                        <span className="text-yellow-600 font-black mr-1 leading-none">4.8</span>
-                                        <span className="text-yellow-400 leading-none pb-0.5">★</span>
-                                    </div>
+                                    {rating && rating.average !== null && (
+                                        <div className="flex items-center bg-yellow-50 px-4 py-2 rounded-full border border-yellow-100">
+                                            <span className="text-yellow-600 font-black mr-1 leading-none">{rating.average.toFixed(1)}</span>
+                                            <span className="text-yellow-400 leading-none pb-0.5">★</span>
+                                            <span className="text-yellow-600 font-bold text-xs ml-2 leading-none">({rating.count})</span>
+                                        </div>
+                                    )}
                                 </div>
                                 
                                 <div className="space-y-8">
@@ -363,6 +403,9 @@ export default function ProductDetails() {
                                             <p className="text-slate-400 font-bold uppercase tracking-widest text-xs">No reviews yet. Be the first!</p>
                                         </div>
                                     )}
+                                    {reviewsCursor && (
+                                        <button onClick={loadMoreReviews} className="w-full py-4 bg-slate-50 text-slate-900 rounded-2xl font-black text-xs uppercase tracking-widest hover:bg-slate-100 transition-colors">More reviews</button>
+                                    )}
                                 </div>
                                 
                                 <div className="mt-12 p-10 bg-indigo-600 rounded-[32px] text-center shadow-2xl shadow-indigo-200">
@@ -6,6 +6,9 @@ interface ProductImage {
     id: number;
     url: string;
     is_primary: boolean;
+    // Resized copies; null until the background resize has finished
+    thumbnail_url?: string | null;
+    medium_url?: string | null;
 }
 
 interface Product {
@@ -22,7 +25,7 @@ const ProductCard = ({ product }: { product: Product }) => {
         <Link href={`/products/${product.id}`} className="group">
             <div className="relative overflow-hidden rounded-2xl bg-slate-100 aspect-[3/4]">
                 <img
-                    src={product.images?.[0]?.url || "https://dummyimage.com/600x800/e2e8f0/64748b&text=Elegant+Style"}
+                    src={product.images?.[0]?.medium_url || product.images?.[0]?.url || "https://dummyimage.com/600x800/e2e8f0/64748b&text=Elegant+Style"}
                     alt={product.name}
                     className="h-full w-full object-cover object-center transition-transform duration-500 group-hover:scale-110"
                 />
@@ -26,12 +26,48 @@ def fix_db():
         
         # Reviews
         cur.execute("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS original_comment TEXT;")
+        cur.execute("ALTER TABLE reviews ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT now();")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_reviews_rating ON reviews (rating);")
+        # Keep each user's newest review of a product so the unique index can be built. The
+        # rating aggregates are emptied with them; feedback rebuilds them when it starts.
+        cur.execute("""
+            DELETE FROM reviews r USING reviews newer
+            WHERE newer.user_id = r.user_id AND newer.product_id = r.product_id AND newer.id > r.id;
+        """)
+        if cur.rowcount:
+            print(f"Removed {cur.rowcount} duplicate reviews.")
+            cur.execute("SELECT to_regclass('rating_aggregates');")
+            if cur.fetchone()[0]:
+                cur.execute("DELETE FROM rating_aggregates;")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_user_id_product_id ON reviews (user_id, product_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_reviews_product_id_created_at ON reviews (product_id, created_at, id);")
+        # Both are leading columns of the indexes above
+        cur.execute("DROP INDEX IF EXISTS ix_reviews_user_id;")
+        cur.execute("DROP INDEX IF EXISTS ix_reviews_product_id;")
         print("Updated reviews table.")
         
         # Bookings (Rental)
         cur.execute("ALTER TABLE bookings ADD COLUMN IF NOT EXISTS is_block BOOLEAN DEFAULT FALSE;")
+        # Redundant with the bookings_no_overlap GiST index on Postgres
+        cur.execute("DROP INDEX IF EXISTS ix_bookings_confirmed_product_end_start;")
         print("Updated bookings table.")
         
+        # Product images
+        cur.execute("ALTER TABLE product_images ADD COLUMN IF NOT EXISTS thumbnail_url VARCHAR;")
+        cur.execute("ALTER TABLE product_images ADD COLUMN IF NOT EXISTS medium_url VARCHAR;")
+        cur.execute("ALTER TABLE product_images ADD COLUMN IF NOT EXISTS blob_digest VARCHAR;")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_product_images_blob_digest ON product_images (blob_digest);")
+        print("Updated product_images table.")
+        
+        # Catalog indexes (create_all only adds these on fresh tables)
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_products_price_1_day_id ON products (price_1_day, id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_product_images_product_id ON product_images (product_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_products_category_price_1_day ON products (category, price_1_day);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_products_color ON products (color);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_products_size ON products (size);")
+        cur.execute("CREATE INDEX IF NOT EXISTS ix_products_available ON products (available);")
+        print("Updated catalog indexes.")
+        
         conn.commit()
         cur.close()
         conn.close()
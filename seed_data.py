@@ -1,4 +1,5 @@
 import os
+import json
 import requests
 import datetime
 
@@ -81,15 +82,29 @@ def seed_products():
         }
     ]
 
+    # One streaming request for the whole list instead of one POST per product
+    lines = []
     for p in products:
-        try:
-            res = requests.post(f"{CATALOG_URL}/products", json=p)
-            if res.status_code == 201:
-                print(f"Created product: {p['name']}")
-            else:
-                print(f"Failed to create {p['name']}: {res.text}")
-        except Exception as e:
-            print(f"Error creating {p['name']}: {e}")
+        row = dict(p)
+        image_url = row.pop("image_url", None)
+        if image_url:
+            row["images"] = [{"url": image_url, "is_primary": True}]
+        lines.append(json.dumps(row))
+    try:
+        res = requests.post(
+            f"{CATALOG_URL}/products/import",
+            data="\n".join(lines).encode("utf-8"),
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        if res.status_code == 200:
+            report = res.json()
+            print(f"Imported products: {report['inserted']} created, {report['failed']} failed")
+            for error in report["errors"]:
+                print(f"Line {error['line']}: {error['error']}")
+        else:
+            print(f"Failed to import products: {res.text}")
+    except Exception as e:
+        print(f"Error importing products: {e}")
 
 def seed_bookings():
     # Example block/booking can be added here if needed
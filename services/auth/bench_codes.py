@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Add current directory to path if needed
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import codes
+
+# Simulated /verify/send traffic against the in-memory stores, on a simulated clock so an
+# hour of traffic runs in seconds. A quarter of sends repeat a recent address (resends).
+SENDS_PER_SECOND = int(os.getenv("BENCH_SENDS_PER_SECOND", 200))
+MINUTES = int(os.getenv("BENCH_MINUTES", 60))
+REPORT_EVERY_MINUTES = 10
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class PlainDictStore:
+    # What main.py used to do: a dict that is only cleaned up on successful confirm
+    def __init__(self, clock):
+        self.clock = clock
+        self._codes = {}
+
+    def set(self, email, code):
+        self._codes[email] = (code, self.clock() + codes.CODE_TTL_SECONDS)
+
+    def __len__(self):
+        return len(self._codes)
+
+
+def run(name, make_store):
+    rng = random.Random(7)
+    clock = Clock()
+    store = make_store(clock)
+    recent = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    print(f"\n== {name}")
+    print(f"{'minute':>6} {'entries':>9} {'memory MB':>10}")
+    for second in range(MINUTES * 60):
+        clock.now = float(second)
+        for i in range(SENDS_PER_SECOND):
+            if recent and rng.random() < 0.25:
+                email = rng.choice(recent)
+            else:
+                email = f"user{second}-{i}@example.com"
+                recent.append(email)
+                if len(recent) > 1000:
+                    recent.pop(0)
+            store.set(email, f"{rng.randint(100000, 999999)}")
+        if (second + 1) % (REPORT_EVERY_MINUTES * 60) == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"{(second + 1) // 60:>6} {len(store):>9,} {current / 1e6:>10.1f}")
+    tracemalloc.stop()
+    sends = MINUTES * 60 * SENDS_PER_SECOND
+    print(f"{sends:,} sends in {time.perf_counter() - start:.1f}s (with tracemalloc on)")
+
+
+def main():
+    print(f"{SENDS_PER_SECOND} sends/s for {MINUTES} simulated minutes, TTL {codes.CODE_TTL_SECONDS}s")
+    run("plain dict (old)", PlainDictStore)
+    run("MemoryCodeStore", lambda clock: codes.MemoryCodeStore(clock=clock))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+import models, database
+
+CODE_TTL_SECONDS = 10 * 60
+# "database" works across uvicorn workers and restarts; "memory" is per process
+CODE_STORE = os.getenv("VERIFICATION_CODE_STORE", "database")
+# Hard cap for the memory store; the soonest-expiring codes are dropped first
+MAX_MEMORY_CODES = int(os.getenv("VERIFICATION_CODE_MAX_ENTRIES", 100000))
+# The database store deletes expired rows once every this many writes
+DB_SWEEP_EVERY = 100
+
+
+class MemoryCodeStore:
+    # Timing wheel with one-second slots: each code sits in the slot of the second it
+    # expires in, so set, delete and expiry are all O(1) and nothing outlives its TTL
+    def __init__(self, ttl: float = CODE_TTL_SECONDS, max_entries: int = MAX_MEMORY_CODES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._codes = {}  # email -> (code, expires_at, slot)
+        # slot -> emails expiring in that second, as an insertion-ordered dict (oldest first)
+        self._slots = {}
+        self._swept = int(clock())  # every slot before this one is empty
+        self._lock = threading.Lock()
+
+    def _unlink(self, email: str):
+        _, _, slot = self._codes.pop(email)
+        emails = self._slots[slot]
+        del emails[email]
+        if not emails:
+            del self._slots[slot]
+
+    def _sweep(self, now: float):
+        # Steps only while codes remain: every slot is at most ttl seconds past the last
+        # set, so one call walks at most ttl slots however long the store sat idle
+        current = int(now)
+        while self._swept < current:
+            if not self._slots:
+                self._swept = current
+                break
+            for email in self._slots.pop(self._swept, ()):
+                del self._codes[email]
+            self._swept += 1
+
+    def _evict_soonest(self):
+        # The oldest code in the soonest slot; a code just set is the newest in the
+        # latest slot, so it is never the one dropped to make room for itself
+        slot = self._swept
+        while slot not in self._slots:
+            slot += 1
+        self._unlink(next(iter(self._slots[slot])))
+
+    def set(self, email: str, code: str):
+        now = self.clock()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._sweep(now)
+            if email in self._codes:
+                self._unlink(email)
+            slot = int(expires_at)
+            self._codes[email] = (code, expires_at, slot)
+            self._slots.setdefault(slot, {})[email] = None
+            while len(self._codes) > self.max_entries:
+                self._evict_soonest()
+
+    def get(self, email: str):
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            entry = self._codes.get(email)
+            if entry is None or entry[1] <= now:
+                return None
+            return entry[0]
+
+    def delete(self, email: str):
+        with self._lock:
+            if email in self._codes:
+                self._unlink(email)
+
+    def __len__(self):
+        return len(self._codes)
+
+
+class DatabaseCodeStore:
+    # One row per email in the shared database, so every worker sees the same codes
+    def __init__(self, ttl: float = CODE_TTL_SECONDS):
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def set(self, email: str, code: str):
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        db = database.SessionLocal()
+        try:
+            try:
+                db.merge(models.VerificationCode(email=email, code=code, expires_at=expires_at))
+                db.commit()
+            except IntegrityError:
+                # A concurrent send inserted the row first; overwrite it
+                db.rollback()
+                db.merge(models.VerificationCode(email=email, code=code, expires_at=expires_at))
+                db.commit()
+            if self._sweep_due():
+                db.query(models.VerificationCode).filter(
+                    models.VerificationCode.expires_at <= datetime.utcnow()
+                ).delete(synchronize_session=False)
+                db.commit()
+        finally:
+            db.close()
+
+    def _sweep_due(self) -> bool:
+        with self._lock:
+            self._writes += 1
+            return self._writes % DB_SWEEP_EVERY == 0
+
+    def get(self, email: str):
+        db = database.SessionLocal()
+        try:
+            row = db.query(models.VerificationCode.code).filter(
+                models.VerificationCode.email == email,
+                models.VerificationCode.expires_at > datetime.utcnow(),
+            ).first()
+            return row.code if row else None
+        finally:
+            db.close()
+
+    def delete(self, email: str):
+        db = database.SessionLocal()
+        try:
+            db.query(models.VerificationCode).filter(models.VerificationCode.email == email).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+def make_store():
+    if CODE_STORE == "memory":
+        return MemoryCodeStore()
+    if CODE_STORE == "database":
+        return DatabaseCodeStore()
+    raise RuntimeError(f"Unknown VERIFICATION_CODE_STORE: {CODE_STORE}")
@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+import time
+
+import requests
+from fastapi import HTTPException
+from google.auth import jwt as google_jwt
+from jose import JWTError, jwt
+from requests.adapters import HTTPAdapter
+
+# Point at a local stand-in key server in tests
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Used when the response has no usable Cache-Control max-age
+DEFAULT_TTL_SECONDS = 3600
+# Fetches happen at most this often, whatever the headers say or which key ids show up
+MIN_FETCH_INTERVAL_SECONDS = int(os.getenv("GOOGLE_CERTS_MIN_FETCH_INTERVAL", 60))
+# Start a background refresh this long before the cached copy expires
+REFRESH_AHEAD_SECONDS = 300
+FETCH_TIMEOUT_SECONDS = 5
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def make_session() -> requests.Session:
+    # Kept for the life of the process so refreshes reuse a warm TLS connection
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=2))
+    return session
+
+
+def ttl_from_headers(headers) -> float:
+    cache_control = headers.get("Cache-Control", "")
+    match = MAX_AGE.search(cache_control)
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        ttl = 0
+    elif match:
+        # A copy from an intermediary cache has already spent part of its lifetime
+        ttl = int(match.group(1)) - int(headers.get("Age") or 0)
+    else:
+        ttl = DEFAULT_TTL_SECONDS
+    return max(ttl, MIN_FETCH_INTERVAL_SECONDS)
+
+
+class CertCache:
+    def __init__(self, url: str, session: requests.Session):
+        self.url = url
+        self.session = session
+        self._certs = None  # key id -> PEM certificate
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._fetched_at = float("-inf")
+        # Single flight: concurrent misses wait for one fetch instead of each making one
+        self._lock = threading.Lock()
+        # Held while a background refresh is running
+        self._refresh_lock = threading.Lock()
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    def _usable(self, kid, now: float) -> bool:
+        if self._certs is None or now >= self._expires_at:
+            return False
+        # An unknown key id means Google may have rotated before our copy expired, but
+        # refetching is still capped at once per MIN_FETCH_INTERVAL_SECONDS
+        return kid is None or kid in self._certs or now - self._fetched_at < MIN_FETCH_INTERVAL_SECONDS
+
+    def get(self, kid: str = None) -> dict:
+        now = time.monotonic()
+        if self._usable(kid, now):
+            if now >= self._refresh_at:
+                self._refresh_in_background()
+            return self._certs
+        with self._lock:
+            if self._usable(kid, time.monotonic()):
+                return self._certs
+            return self._fetch()
+
+    def _fetch(self) -> dict:
+        # Caller holds the lock
+        try:
+            response = self.session.get(self.url, timeout=FETCH_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            certs = response.json()
+        except (requests.RequestException, ValueError) as e:
+            self.fetch_errors += 1
+            print(f"Could not fetch Google certificates: {e}")
+            if self._certs is None:
+                raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable")
+            # Keep serving the copy we have and try again after the minimum interval
+            self._expires_at = self._refresh_at = time.monotonic() + MIN_FETCH_INTERVAL_SECONDS
+            return self._certs
+        now = time.monotonic()
+        self.fetches += 1
+        self._certs = certs
+        self._fetched_at = now
+        self._expires_at = now + ttl_from_headers(response.headers)
+        self._refresh_at = max(self._expires_at - REFRESH_AHEAD_SECONDS, now + MIN_FETCH_INTERVAL_SECONDS)
+        return certs
+
+    def _refresh_in_background(self):
+        if self._refresh_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                # A foreground fetch may have beaten us to it
+                if time.monotonic() >= self._refresh_at:
+                    self._fetch()
+        except HTTPException:
+            pass
+        finally:
+            self._refresh_lock.release()
+
+
+cert_cache = CertCache(GOOGLE_CERTS_URL, make_session())
+
+
+def verify_id_token(token: str, audience: str) -> dict:
+    # Same checks as google.oauth2.id_token.verify_oauth2_token, with cached certificates.
+    # Raises ValueError for any invalid token.
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError:
+        raise ValueError("Malformed token")
+    idinfo = google_jwt.decode(token, certs=cert_cache.get(kid), audience=audience)
+    if idinfo.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError(f"Wrong issuer: {idinfo.get('iss')}")
+    return idinfo
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+import utils
+
+# bcrypt releases the GIL while hashing, so worker threads hash in parallel
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+# Hashes allowed to wait for a free worker; past that, requests get 503 straight away.
+# Keep workers + queue well under the request threadpool (40 threads) so /health and
+# /verify/* always find a free slot during a login spike.
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", 16))
+RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", 1))
+
+
+class HashPool:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0  # submitted and not finished: running plus queued
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.rehashed = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    def run(self, fn, *args):
+        # Runs fn on a hashing worker and waits for it, or raises 503 if the queue is full
+        with self._lock:
+            if self._pending >= self.workers + self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many sign-ins in progress, please retry shortly",
+                    headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+                )
+            self._pending += 1
+            self.submitted += 1
+        queued_at = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self.wait_seconds += started - queued_at
+                    self.hash_seconds += finished - started
+
+        try:
+            return self._executor.submit(task).result()
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def record_rehash(self):
+        with self._lock:
+            self.rehashed += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            done = self.submitted - self._pending
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "running": min(self._pending, self.workers),
+                "queued": max(self._pending - self.workers, 0),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": self.wait_seconds / done * 1000 if done else 0.0,
+                "avg_hash_ms": self.hash_seconds / done * 1000 if done else 0.0,
+                "bcrypt_rounds": utils.BCRYPT_ROUNDS,
+            }
+
+
+hash_pool = HashPool(HASH_WORKERS, HASH_QUEUE_LIMIT)
+
+
+def hash_password(password: str) -> str:
+    return hash_pool.run(utils.get_password_hash, password)
+
+
+def verify_and_update(password: str, hashed_password: str):
+    # Returns (valid, new_hash); new_hash is set when the stored hash should be replaced
+    valid, new_hash = hash_pool.run(utils.verify_and_update_password, password, hashed_password)
+    if new_hash:
+        hash_pool.record_rehash()
+    return valid, new_hash
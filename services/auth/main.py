@@ -1,21 +1,31 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException, status
-from typing import List
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, Response
+from typing import List, Optional
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta, datetime
+from datetime import timedelta
 from fastapi.middleware.cors import CORSMiddleware
 import random
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import hmac
+from contextlib import asynccontextmanager
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
 from pydantic import EmailStr
 
-import models, schemas, utils, database
+import models, schemas, utils, database, hashing, google_certs, codes, outbox, pagination, ratelimit, user_stats
 
 models.Base.metadata.create_all(bind=database.engine)
+user_stats.install()
 
-app = FastAPI(title="Auth Service")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Delivers queued emails in the background; see outbox.py
+    if outbox.MAIL_ENABLED:
+        outbox.worker.start(conf)
+    yield
+    await outbox.worker.stop()
+
+app = FastAPI(title="Auth Service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Admin Emails Allowlist (User should provide these)
@@ -35,9 +46,9 @@ conf = ConnectionConfig(
     MAIL_FROM = os.getenv("MAIL_FROM", "noreply@stylerent.com"),
     MAIL_PORT = int(os.getenv("MAIL_PORT", 587)),
     MAIL_SERVER = os.getenv("MAIL_SERVER", "smtp.gmail.com"),
-    MAIL_STARTTLS = True,
+    MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() == "true",
     MAIL_SSL_TLS = False,
-    USE_CREDENTIALS = True,
+    USE_CREDENTIALS = os.getenv("MAIL_USE_CREDENTIALS", "true").lower() == "true",
     VALIDATE_CERTS = True
 )
 
@@ -51,7 +62,7 @@ def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="Password too long (max 72 bytes)")
 
     is_admin = user.email in ADMIN_EMAILS
-    hashed_password = utils.get_password_hash(user.password)
+    hashed_password = hashing.hash_password(user.password)
     new_user = models.User(
         email=user.email, 
         hashed_password=hashed_password, 
@@ -59,6 +70,7 @@ def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
         is_admin=is_admin
     )
     db.add(new_user)
+    user_stats.user_added(db, new_user)
     db.commit()
     db.refresh(new_user)
     
@@ -69,29 +81,42 @@ def signup(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
 
 def send_verification_logic(email: str):
     code = f"{random.randint(100000, 999999)}"
-    verification_codes[email] = {"code": code, "expires": datetime.utcnow() + timedelta(minutes=10)}
-    
-    # MOCK: Still print to terminal in case SMTP fails or is not configured
-    print(f"VERIFICATION CODE FOR {email}: {code}")
+    verification_codes.set(email, code)
     
-    # Optional: Actual email sending background task could be here
-    # but for simplicity in this flow, we print it. 
-    # If MAIL_USERNAME is configured, we could attempt to send.
+    # If MAIL_USERNAME is configured the email is queued in the outbox and sent by the
+    # background worker, so the request returns without waiting on SMTP. Otherwise
+    # (local runs) the code is printed to the terminal, never both: logs must not hold live codes.
+    if not outbox.MAIL_ENABLED:
+        print(f"VERIFICATION CODE FOR {email}: {code}")
+    else:
+        outbox.enqueue(
+            email,
+            "Your StyleRent verification code",
+            f"Your verification code is {code}. It expires in {codes.CODE_TTL_SECONDS // 60} minutes.",
+        )
 
 @app.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    # Before the lookup and the bcrypt check, so a burst costs neither
+    ratelimit.check_login(request, form_data.username)
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not utils.verify_password(form_data.password, user.hashed_password):
+    valid, new_hash = hashing.verify_and_update(form_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with an older bcrypt cost; upgrade now that we have the plain password
+        user.hashed_password = new_hash
+        db.commit()
+        db.refresh(user)
     
     # Sync admin status during login
     is_admin = user.email in ADMIN_EMAILS
     if is_admin != user.is_admin:
-        user.is_admin = is_admin
+        user_stats.set_flag(db, user, models.User.is_admin, is_admin)
         db.commit()
         db.refresh(user)
     
@@ -107,8 +132,8 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-# In-memory store for verification codes (Dev only)
-verification_codes = {}
+# Memory or database backed, see VERIFICATION_CODE_STORE
+verification_codes = codes.make_store()
 
 @app.post("/google-login", response_model=schemas.Token)
 def google_login(data: schemas.GoogleLogin, db: Session = Depends(database.get_db)):
@@ -120,7 +145,7 @@ def google_login(data: schemas.GoogleLogin, db: Session = Depends(database.get_d
             # Fallback for dev if not set, but practically we need it
             raise HTTPException(status_code=500, detail="Google Client ID not configured")
             
-        idinfo = id_token.verify_oauth2_token(data.id_token, google_requests.Request(), GOOGLE_CLIENT_ID)
+        idinfo = google_certs.verify_id_token(data.id_token, GOOGLE_CLIENT_ID)
         
         email = idinfo['email']
         google_id = idinfo['sub']
@@ -138,12 +163,13 @@ def google_login(data: schemas.GoogleLogin, db: Session = Depends(database.get_d
                 is_verified_email=True # Google emails are pre-verified
             )
             db.add(user)
+            user_stats.user_added(db, user)
             db.commit()
             db.refresh(user)
         elif not user.google_id:
             # Link google account to existing email
             user.google_id = google_id
-            user.is_verified_email = True
+            user_stats.set_flag(db, user, models.User.is_verified_email, True)
             db.commit()
             db.refresh(user)
 
@@ -162,29 +188,72 @@ def google_login(data: schemas.GoogleLogin, db: Session = Depends(database.get_d
         raise HTTPException(status_code=400, detail="Invalid Google token")
 
 @app.post("/verify/send")
-def send_verification(data: schemas.VerificationSend):
+def send_verification(request: Request, data: schemas.VerificationSend):
+    ratelimit.check_verification_send(request, data.email)
     send_verification_logic(data.email)
     return {"message": "Verification code sent to email"}
 
 @app.post("/verify/confirm")
 def confirm_verification(data: schemas.VerificationConfirm, db: Session = Depends(database.get_db)):
-    entry = verification_codes.get(data.email)
-    if not entry or entry["code"] != data.code or entry["expires"] < datetime.utcnow():
+    code = verification_codes.get(data.email)
+    if code is None or not hmac.compare_digest(code, data.code):
         raise HTTPException(status_code=400, detail="Invalid or expired code")
     
     user = db.query(models.User).filter(models.User.email == data.email).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    user.is_verified_email = True
+    user_stats.set_flag(db, user, models.User.is_verified_email, True)
     db.commit()
-    del verification_codes[data.email]
+    verification_codes.delete(data.email)
     return {"message": "Verification successful"}
 
 @app.get("/users", response_model=List[schemas.UserResponse])
 def get_users(db: Session = Depends(database.get_db)):
     return db.query(models.User).all()
 
+# Number of newest users returned by /admin/summary
+SUMMARY_RECENT = 5
+
+@app.get("/admin/users", response_model=List[schemas.UserResponse])
+def admin_list_users(
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    email: Optional[str] = None,
+    is_admin: Optional[bool] = None,
+    is_verified_email: Optional[bool] = None,
+    db: Session = Depends(database.get_db)
+):
+    # Newest first; the next page is named by the X-Next-Cursor header
+    query = db.query(models.User)
+    if email:
+        # Prefix search, case-insensitive
+        query = query.filter(func.lower(models.User.email).startswith(email.lower(), autoescape=True))
+    if is_admin is not None:
+        query = query.filter(models.User.is_admin == is_admin)
+    if is_verified_email is not None:
+        query = query.filter(models.User.is_verified_email == is_verified_email)
+    users, next_cursor = pagination.newest_first(query, (models.User.id,), limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
+
+@app.get("/admin/summary", response_model=schemas.UserSummary)
+def admin_summary(db: Session = Depends(database.get_db)):
+    # Counts from the user_stats row, plus the newest few users straight off the primary
+    # key: two index lookups whatever the size of the users table
+    recent = db.query(models.User).order_by(models.User.id.desc()).limit(SUMMARY_RECENT).all()
+    return {**user_stats.get(db), "recent": recent}
+
+@app.get("/hashing/stats")
+def hashing_stats():
+    return hashing.hash_pool.stats()
+
+@app.get("/ratelimit/stats")
+def ratelimit_stats():
+    return ratelimit.limiter.stats()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, Index
+from datetime import datetime
 from database import Base
 
 class User(Base):
@@ -12,3 +13,47 @@ class User(Base):
     is_verified_email = Column(Boolean, default=False)
     google_id = Column(String, unique=True, index=True, nullable=True)
     full_name = Column(String, nullable=True)
+
+class UserStats(Base):
+    # A single row of user counts, kept in step by user_stats.py in the same transaction
+    # as every user write, so the admin summary never has to count the users table
+    __tablename__ = "user_stats"
+
+    id = Column(Integer, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)
+    admins = Column(Integer, nullable=False, default=0)
+    verified_email = Column(Integer, nullable=False, default=0)
+
+class VerificationCode(Base):
+    __tablename__ = "verification_codes"
+
+    email = Column(String, primary_key=True)
+    code = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class RateLimitBucket(Base):
+    # Token buckets shared between workers when RATE_LIMIT_BACKEND=database
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True) # Unix time
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String, default="pending", nullable=False) # pending, sent, failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The delivery worker's "due now" scan
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
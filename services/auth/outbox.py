@@ -0,0 +1,226 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+import aiosmtplib
+from sqlalchemy import func
+import models, database
+
+# Without SMTP credentials codes are only printed, as before
+MAIL_ENABLED = bool(os.getenv("MAIL_USERNAME"))
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+# Retry delays: 30s, 1m, 2m, 4m, 8m, capped at an hour
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# Claimed rows are skipped by other workers for this long, so a crashed worker's
+# batch is retried rather than lost
+LEASE_SECONDS = 120
+# Picks up rows written by other workers or left over from a restart
+POLL_SECONDS = 30
+# Close the SMTP connection (and prune old sent rows) after this long without mail
+IDLE_DISCONNECT_SECONDS = 60
+SENT_RETENTION = timedelta(days=1)
+
+
+def enqueue(recipient: str, subject: str, body: str):
+    # Durable first: the row survives a crash before delivery
+    db = database.SessionLocal()
+    try:
+        db.add(models.EmailOutbox(recipient=recipient, subject=subject, body=body))
+        db.commit()
+    finally:
+        db.close()
+    worker.notify()
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+def claim_batch():
+    # Returns up to BATCH_SIZE due messages and leases them to this worker
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        query = db.query(models.EmailOutbox).filter(
+            models.EmailOutbox.status == "pending",
+            models.EmailOutbox.next_attempt_at <= now,
+        ).order_by(models.EmailOutbox.next_attempt_at).limit(BATCH_SIZE)
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        rows = query.all()
+        batch = []
+        for row in rows:
+            row.attempts += 1
+            row.next_attempt_at = now + timedelta(seconds=LEASE_SECONDS)
+            batch.append((row.id, row.recipient, row.subject, row.body, row.attempts))
+        db.commit()
+        return batch
+    finally:
+        db.close()
+
+
+def record_results(results: dict):
+    # results: message id -> (attempts, None on success or (error, permanent))
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        rows = db.query(models.EmailOutbox).filter(models.EmailOutbox.id.in_(results.keys())).all()
+        for row in rows:
+            attempts, failure = results[row.id]
+            if failure is None:
+                row.status = "sent"
+                row.sent_at = now
+                continue
+            error, permanent = failure
+            row.last_error = error[:500]
+            if permanent or attempts >= MAX_ATTEMPTS:
+                row.status = "failed"
+            else:
+                row.next_attempt_at = now + backoff(attempts)
+        db.commit()
+    finally:
+        db.close()
+
+
+def seconds_until_next_due() -> float:
+    db = database.SessionLocal()
+    try:
+        next_at = db.query(func.min(models.EmailOutbox.next_attempt_at)).filter(
+            models.EmailOutbox.status == "pending"
+        ).scalar()
+    finally:
+        db.close()
+    if next_at is None:
+        return POLL_SECONDS
+    return min(max((next_at - datetime.utcnow()).total_seconds(), 0), POLL_SECONDS)
+
+
+def prune_sent():
+    db = database.SessionLocal()
+    try:
+        db.query(models.EmailOutbox).filter(
+            models.EmailOutbox.status == "sent",
+            models.EmailOutbox.sent_at < datetime.utcnow() - SENT_RETENTION,
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class OutboxWorker:
+    # One asyncio task per process. Handlers stay synchronous: they write the outbox
+    # row and nudge the task, which sends whole batches over one SMTP connection.
+    def __init__(self):
+        self.conf = None
+        self._loop = None
+        self._wake = None
+        self._task = None
+        self._smtp = None
+
+    def start(self, conf):
+        self.conf = conf
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self._disconnect()
+
+    def notify(self):
+        # Safe from any thread
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        last_sent = time.monotonic()
+        while True:
+            self._wake.clear()
+            try:
+                batch = await asyncio.to_thread(claim_batch)
+                if batch:
+                    results = await self._deliver(batch)
+                    await asyncio.to_thread(record_results, results)
+                    last_sent = time.monotonic()
+                    # There may be more due right away
+                    continue
+                if self._smtp is not None and time.monotonic() - last_sent >= IDLE_DISCONNECT_SECONDS:
+                    await self._disconnect()
+                    await asyncio.to_thread(prune_sent)
+                # Sleep until the next retry is due, a new message arrives or the poll interval
+                timeout = await asyncio.to_thread(seconds_until_next_due)
+            except Exception as e:
+                print(f"Email outbox error: {e}")
+                timeout = POLL_SECONDS
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _connect(self):
+        # Reuses the open connection across batches until it idles out or drops
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        conf = self.conf
+        smtp = aiosmtplib.SMTP(
+            hostname=conf.MAIL_SERVER,
+            port=conf.MAIL_PORT,
+            use_tls=conf.MAIL_SSL_TLS,
+            start_tls=conf.MAIL_STARTTLS,
+            validate_certs=conf.VALIDATE_CERTS,
+            timeout=conf.TIMEOUT,
+        )
+        await smtp.connect()
+        if conf.USE_CREDENTIALS:
+            await smtp.login(conf.MAIL_USERNAME, conf.MAIL_PASSWORD.get_secret_value())
+        self._smtp = smtp
+        return smtp
+
+    async def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+    def _message(self, recipient: str, subject: str, body: str) -> EmailMessage:
+        message = EmailMessage()
+        message["From"] = self.conf.MAIL_FROM
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        return message
+
+    async def _deliver(self, batch) -> dict:
+        results = {}
+        try:
+            smtp = await self._connect()
+            for message_id, recipient, subject, body, attempts in batch:
+                try:
+                    await smtp.send_message(self._message(recipient, subject, body))
+                    results[message_id] = (attempts, None)
+                except aiosmtplib.SMTPRecipientsRefused as e:
+                    results[message_id] = (attempts, (str(e), True))
+                except aiosmtplib.SMTPResponseException as e:
+                    # 5xx replies won't succeed on retry
+                    results[message_id] = (attempts, (str(e), e.code >= 500))
+        except (aiosmtplib.SMTPException, OSError) as e:
+            # Connection level: everything not yet sent is retried later
+            await self._disconnect()
+            for message_id, _, _, _, attempts in batch:
+                results.setdefault(message_id, (attempts, (str(e), False)))
+        return results
+
+
+worker = OutboxWorker()
@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values) -> str:
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        decoded = []
+        for column, value in zip(columns, values):
+            if isinstance(column.type, DateTime):
+                decoded.append(datetime.fromisoformat(value))
+            elif isinstance(value, int):
+                decoded.append(value)
+            else:
+                raise ValueError
+        return decoded
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def newest_first(query, columns, limit: int, cursor: str = None):
+    # Keyset page in descending key order, newest first: every page is an index range
+    # scan from the cursor, however deep into the table it is. The last column must be
+    # unique (the primary key). Returns (rows, next cursor).
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y), spelled out for SQLite
+        clauses = []
+        for i, column in enumerate(columns):
+            equal = [columns[j] == values[j] for j in range(i)]
+            clauses.append(and_(*equal, column < values[i]))
+        # The redundant bound on the leading column lets Postgres start the index scan
+        # at the cursor instead of filtering out every newer row on the way there
+        query = query.filter(columns[0] <= values[0], or_(*clauses))
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(*(column.desc() for column in columns)).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(*(getattr(rows[-1], column.key) for column in columns))
+    return rows, None
@@ -0,0 +1,201 @@
+import math
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from sqlalchemy import text
+
+import models, database
+
+# "memory" is per process; "database" shares buckets between uvicorn workers at the cost
+# of one upsert per check
+BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+SHARDS = 16
+# Across all shards; the least recently used keys are dropped first and start over full
+MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+# The database backend deletes idle buckets once every this many checks
+DB_SWEEP_EVERY = 1000
+# Reverse proxies in front of this service that append to X-Forwarded-For
+# (nginx, then the web app's rewrite); 0 uses the peer address as is
+TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 1))
+
+
+def parse_rule(spec: str):
+    # "5/60" allows bursts of 5 and refills the whole bucket over 60 seconds
+    burst, _, seconds = spec.partition("/")
+    return int(burst), int(burst) / float(seconds)
+
+
+# (capacity, tokens per second) per limit, overridable as "burst/seconds"
+RULES = {
+    "login:ip": parse_rule(os.getenv("RATE_LIMIT_LOGIN_IP", "30/60")),
+    "login:email": parse_rule(os.getenv("RATE_LIMIT_LOGIN_EMAIL", "5/300")),
+    "verify:ip": parse_rule(os.getenv("RATE_LIMIT_VERIFY_IP", "10/600")),
+    "verify:email": parse_rule(os.getenv("RATE_LIMIT_VERIFY_EMAIL", "3/600")),
+}
+
+
+class MemoryBuckets:
+    # Token buckets split over independent shards, each an LRU with its own lock, so
+    # concurrent checks on different keys rarely contend. A check is one dict lookup.
+    def __init__(self, shards: int = SHARDS, max_keys: int = MAX_KEYS, clock=time.monotonic):
+        self.clock = clock
+        self._shards = [OrderedDict() for _ in range(shards)]  # key -> [tokens, updated_at]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._shard_size = max(1, max_keys // shards)
+        self.evictions = 0
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        # Returns 0 if a token was taken, otherwise seconds until one is available
+        i = zlib.crc32(key.encode()) % len(self._shards)
+        buckets = self._shards[i]
+        with self._locks[i]:
+            now = self.clock()
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [capacity, now]
+                if len(buckets) > self._shard_size:
+                    buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def size(self) -> int:
+        return sum(len(buckets) for buckets in self._shards)
+
+
+# Refill and take in one statement, so concurrent workers can't both spend the last token.
+# The conditional DO UPDATE leaves an empty bucket untouched and returns no row.
+TAKE_SQL = text("""
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (:key, :capacity - 1, :now)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = MIN(:capacity, b.tokens + (:now - b.updated_at) * :rate) - 1,
+        updated_at = :now
+    WHERE MIN(:capacity, b.tokens + (:now - b.updated_at) * :rate) >= 1
+    RETURNING tokens
+""")
+PEEK_SQL = text("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = :key")
+
+
+class DatabaseBuckets:
+    def __init__(self):
+        self._checks = 0
+        self._lock = threading.Lock()
+        self._take_sql = None
+        self.evictions = 0
+
+    def _statement(self, dialect: str):
+        if self._take_sql is None:
+            # Postgres spells two-argument MIN as LEAST
+            self._take_sql = TAKE_SQL if dialect == "sqlite" else text(TAKE_SQL.text.replace("MIN(", "LEAST("))
+        return self._take_sql
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.time()
+        db = database.SessionLocal()
+        try:
+            params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+            taken = db.execute(self._statement(db.get_bind().dialect.name), params).first()
+            db.commit()
+            if self._sweep_due():
+                # A bucket idle for a day is full again anyway
+                db.query(models.RateLimitBucket).filter(
+                    models.RateLimitBucket.updated_at < now - 86400
+                ).delete(synchronize_session=False)
+                db.commit()
+            if taken is not None:
+                return 0.0
+            row = db.execute(PEEK_SQL, {"key": key}).first()
+            tokens = min(capacity, row.tokens + (now - row.updated_at) * rate) if row else 0
+            return max((1 - tokens) / rate, 0.0)
+        finally:
+            db.close()
+
+    def _sweep_due(self) -> bool:
+        with self._lock:
+            self._checks += 1
+            return self._checks % DB_SWEEP_EVERY == 0
+
+    def size(self) -> int:
+        db = database.SessionLocal()
+        try:
+            return db.query(models.RateLimitBucket).count()
+        finally:
+            db.close()
+
+
+class RateLimiter:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = {}  # rule -> count
+
+    def check(self, *limits):
+        # limits are (rule, key) pairs. Every bucket is charged even when an earlier one
+        # is empty, so rotating emails from one IP still drains the IP's bucket.
+        wait, hit = 0.0, None
+        for rule, key in limits:
+            capacity, rate = RULES[rule]
+            retry_after = self.buckets.take(f"{rule}:{key}", capacity, rate)
+            if retry_after > wait:
+                wait, hit = retry_after, rule
+        with self._lock:
+            if hit is None:
+                self.allowed += 1
+            else:
+                self.rejected[hit] = self.rejected.get(hit, 0) + 1
+        if hit is not None:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": BACKEND,
+                "allowed": self.allowed,
+                "rejected": dict(self.rejected),
+                "keys": self.buckets.size(),
+                "evictions": self.buckets.evictions,
+                "rules": {rule: {"burst": c, "per_second": r} for rule, (c, r) in RULES.items()},
+            }
+
+
+def make_limiter() -> RateLimiter:
+    if BACKEND == "memory":
+        return RateLimiter(MemoryBuckets())
+    if BACKEND == "database":
+        return RateLimiter(DatabaseBuckets())
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {BACKEND}")
+
+
+limiter = make_limiter()
+
+
+def client_ip(request: Request) -> str:
+    forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+    if TRUSTED_PROXIES and forwarded:
+        # Entries before the ones our own proxies appended are client-controlled
+        return forwarded[-min(TRUSTED_PROXIES, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+
+def check_login(request: Request, email: str):
+    limiter.check(("login:ip", client_ip(request)), ("login:email", email.strip().lower()))
+
+
+def check_verification_send(request: Request, email: str):
+    limiter.check(("verify:ip", client_ip(request)), ("verify:email", email.strip().lower()))
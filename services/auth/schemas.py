@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -18,6 +18,12 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class UserSummary(BaseModel):
+    users: int
+    admins: int
+    verified_email: int
+    recent: List[UserResponse]
+
 class GoogleLogin(BaseModel):
     id_token: str
 
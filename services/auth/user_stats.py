@@ -0,0 +1,62 @@
+from sqlalchemy import func, or_, text
+
+import models, database
+
+STATS_ID = 1
+# Advisory lock held while the row is first built; rental uses 1011, feedback 1024
+STATS_LOCK_NAMESPACE = 1025
+INSTALL_LOCK_SQL = text(f"SELECT pg_advisory_xact_lock({STATS_LOCK_NAMESPACE}, 0)")
+
+User = models.User
+Stats = models.UserStats
+
+
+def apply(db, users: int = 0, admins: int = 0, verified_email: int = 0):
+    # In-place increments in the caller's transaction; concurrent writers queue on the row
+    db.query(Stats).filter(Stats.id == STATS_ID).update({
+        Stats.users: Stats.users + users,
+        Stats.admins: Stats.admins + admins,
+        Stats.verified_email: Stats.verified_email + verified_email,
+    }, synchronize_session=False)
+
+
+def user_added(db, user):
+    apply(db, users=1, admins=int(bool(user.is_admin)), verified_email=int(bool(user.is_verified_email)))
+
+
+def set_flag(db, user, column, value: bool):
+    # Flips is_admin or is_verified_email with a conditional UPDATE, and counts it only if
+    # this transaction actually changed the row: two concurrent confirms count once
+    changed = db.query(User).filter(
+        User.id == user.id, or_(column != value, column.is_(None))
+    ).update({column: value}, synchronize_session="evaluate")
+    if changed:
+        delta = 1 if value else -1
+        apply(db, **{"admins" if column is User.is_admin else "verified_email": delta})
+    return bool(changed)
+
+
+def get(db) -> dict:
+    row = db.query(Stats).filter(Stats.id == STATS_ID).first()
+    if row is None:
+        return {"users": 0, "admins": 0, "verified_email": 0}
+    return {"users": row.users, "admins": row.admins, "verified_email": row.verified_email}
+
+
+def install():
+    # Builds the row from the users table once. Workers start together; on Postgres the
+    # first to take the lock counts and the rest wait for its commit and find the row.
+    db = database.SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(INSTALL_LOCK_SQL)
+        if db.query(Stats).filter(Stats.id == STATS_ID).first() is None:
+            users, admins, verified = db.query(
+                func.count(User.id),
+                func.count(User.id).filter(User.is_admin == True),
+                func.count(User.id).filter(User.is_verified_email == True),
+            ).one()
+            db.add(Stats(id=STATS_ID, users=users, admins=admins, verified_email=verified))
+        db.commit()
+    finally:
+        db.close()
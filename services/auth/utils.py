@@ -1,16 +1,35 @@
+import os
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 
-PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
-SECRET_KEY = "supersecretkey" # TODO: Move to env var
-ALGORITHM = "HS256"
+# Raising the cost takes effect on each user's next login: their hash is upgraded then
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+# The other services verify tokens locally (see their tokens.py) and need the same settings.
+# To rotate, issue under a new JWT_KEY_ID/JWT_SECRET_KEY and list the old pair in their
+# JWT_PREVIOUS_KEYS until tokens signed with it have expired. Setting JWT_PRIVATE_KEY_FILE
+# switches signing to RS256, so the other services only hold the public key.
+SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")
+JWT_KEY_ID = os.getenv("JWT_KEY_ID", "default")
+JWT_PRIVATE_KEY_FILE = os.getenv("JWT_PRIVATE_KEY_FILE")
+if JWT_PRIVATE_KEY_FILE:
+    with open(JWT_PRIVATE_KEY_FILE) as f:
+        SIGNING_KEY = f.read()
+    ALGORITHM = "RS256"
+else:
+    SIGNING_KEY = SECRET_KEY
+    ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 def verify_password(plain_password, hashed_password):
     return PWD_CONTEXT.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password, hashed_password):
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost
+    return PWD_CONTEXT.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password):
     return PWD_CONTEXT.hash(password)
 
@@ -21,5 +40,5 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, algorithm=ALGORITHM, headers={"kid": JWT_KEY_ID})
     return encoded_jwt
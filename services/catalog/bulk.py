@@ -0,0 +1,197 @@
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+
+import models, schemas, database, pagination, media, versions
+
+IMPORT_BATCH_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+# Keeps the import report bounded when a whole file is malformed
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def iter_lines(request):
+    # Yields (line number, bytes) for each non-blank NDJSON line as the body streams in
+    buffer = b""
+    line_no = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for raw in lines:
+            line_no += 1
+            if raw.strip():
+                yield line_no, raw
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+def parse_line(line_no: int, raw: bytes, report: ImportReport):
+    try:
+        return schemas.ProductImport.model_validate_json(raw)
+    except ValidationError as e:
+        report.error(line_no, "; ".join(
+            f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()
+        ))
+        return None
+
+
+def ensure_categories(db, names):
+    # One SELECT for the whole batch instead of one per category
+    names = set(names)
+    existing = {n for (n,) in db.query(models.Category.name).filter(models.Category.name.in_(names))}
+    missing = names - existing
+    db.add_all(models.Category(name=n) for n in missing)
+
+
+def build_images(db, images):
+    result = []
+    for img in images:
+        image = models.ProductImage(url=img.url, is_primary=img.is_primary)
+        # Re-imported exports point at stored blobs; take a reference so deletes stay safe
+        media.reference_stored_image(db, image)
+        result.append(image)
+    return result
+
+
+def drop_duplicate_ids(rows, report: ImportReport):
+    # The first row for an id wins; later ones in the same batch are reported, not applied
+    first_line = {}
+    kept = []
+    for line_no, row in rows:
+        if row.id is not None:
+            if row.id in first_line:
+                report.error(line_no, f"Duplicate id {row.id}; already given on line {first_line[row.id]}")
+                continue
+            first_line[row.id] = line_no
+        kept.append((line_no, row))
+    return kept
+
+
+def new_product(db, row):
+    exclude = {"images"} if row.id is not None else {"id", "images"}
+    product = models.Product(**row.model_dump(exclude=exclude))
+    product.images = build_images(db, row.images)
+    db.add(product)
+
+
+def apply_rows(db, rows):
+    # Upsert: rows whose id exists update that product, everything else is inserted
+    # (keeping its id when it has one, so an export loads into an empty database).
+    # Returns (inserted, updated); nothing is counted until the caller commits.
+    ids = [row.id for _, row in rows if row.id is not None]
+    found = {}
+    if ids:
+        existing = (
+            db.query(models.Product)
+            .options(selectinload(models.Product.images))
+            .filter(models.Product.id.in_(ids))
+            .all()
+        )
+        found = {p.id: p for p in existing}
+
+    inserted = updated = 0
+    explicit_ids = False
+    for _, row in rows:
+        product = found.get(row.id) if row.id is not None else None
+        if product is None:
+            new_product(db, row)
+            inserted += 1
+            explicit_ids = explicit_ids or row.id is not None
+            continue
+        data = row.model_dump(exclude={"id", "images"}, exclude_unset=True)
+        for key, value in data.items():
+            setattr(product, key, value)
+        if "images" in row.model_fields_set:
+            # Reference the new images before releasing the old ones, so a blob kept
+            # across the update never drops to zero and loses its files
+            images = build_images(db, row.images)
+            for image in product.images:
+                media.release_image(db, image)
+            product.images = images
+        updated += 1
+
+    if explicit_ids and db.get_bind().dialect.name == "postgresql":
+        # Explicit ids don't advance the sequence; move it past them so later
+        # inserts without an id don't collide
+        db.flush()
+        db.execute(text(
+            "SELECT setval(pg_get_serial_sequence('products', 'id'), (SELECT MAX(id) FROM products))"
+        ))
+    return inserted, updated
+
+
+def import_batch(rows, report: ImportReport):
+    # Each batch is its own transaction; a failing batch is retried row by row
+    # so one bad row doesn't sink the others
+    rows = drop_duplicate_ids(rows, report)
+    db = database.SessionLocal()
+    try:
+        try:
+            ensure_categories(db, [row.category for _, row in rows])
+            inserted, updated = apply_rows(db, rows)
+            versions.bump(db, versions.PRODUCTS, versions.CATEGORIES)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+        else:
+            report.inserted += inserted
+            report.updated += updated
+            return
+
+        for line_no, row in rows:
+            try:
+                ensure_categories(db, [row.category])
+                inserted, updated = apply_rows(db, [(line_no, row)])
+                versions.bump(db, versions.PRODUCTS, versions.CATEGORIES)
+                db.commit()
+            except SQLAlchemyError as e:
+                db.rollback()
+                report.error(line_no, str(getattr(e, "orig", None) or e).strip())
+                continue
+            report.inserted += inserted
+            report.updated += updated
+    finally:
+        db.close()
+
+
+def export_lines():
+    # Own session: the response is streamed after the request's dependencies close.
+    # yield_per streams from a server-side cursor, so memory is bounded by the batch size.
+    db = database.SessionLocal()
+    try:
+        stmt = (
+            select(models.Product)
+            .options(selectinload(models.Product.images))
+            .order_by(models.Product.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for product in db.execute(stmt).scalars():
+            row = pagination.serialize_product(product, pagination.PRODUCT_FIELDS)
+            yield json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+from typing import List, Optional
+
+from fastapi import Query
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+
+import models
+
+# Upper bounds of the price_1_day buckets reported by /products/facets
+PRICE_BUCKETS = [500, 1000, 2000, 5000]
+
+FACETS = ("category", "color", "size", "available", "price")
+
+
+class ProductFilters:
+    def __init__(
+        self,
+        category: Optional[List[str]] = Query(None),
+        color: Optional[List[str]] = Query(None),
+        size: Optional[List[str]] = Query(None),
+        min_price: Optional[float] = Query(None, ge=0),
+        max_price: Optional[float] = Query(None, ge=0),
+        available: Optional[bool] = None,
+    ):
+        self.category = category
+        self.color = color
+        self.size = size
+        self.min_price = min_price
+        self.max_price = max_price
+        self.available = available
+
+    def key(self):
+        return (
+            tuple(self.category or ()), tuple(self.color or ()), tuple(self.size or ()),
+            self.min_price, self.max_price, self.available,
+        )
+
+    def apply(self, query):
+        if self.category:
+            query = query.filter(models.Product.category.in_(self.category))
+        if self.color:
+            query = query.filter(models.Product.color.in_(self.color))
+        if self.size:
+            query = query.filter(models.Product.size.in_(self.size))
+        if self.min_price is not None:
+            query = query.filter(models.Product.price_1_day >= self.min_price)
+        if self.max_price is not None:
+            query = query.filter(models.Product.price_1_day <= self.max_price)
+        if self.available is not None:
+            query = query.filter(models.Product.available == self.available)
+        return query
+
+
+def price_bucket(index: int) -> dict:
+    lower = PRICE_BUCKETS[index - 1] if index > 0 else 0
+    upper = PRICE_BUCKETS[index] if index < len(PRICE_BUCKETS) else None
+    return {"bucket": index, "min": lower, "max": upper}
+
+
+def count_facets(db, query) -> dict:
+    # `query` selects the filtered products; it is evaluated once as a CTE and every
+    # facet is grouped over it, so all counts come back from a single statement
+    filtered = query.with_entities(
+        models.Product.category,
+        models.Product.color,
+        models.Product.size,
+        models.Product.available,
+        models.Product.price_1_day,
+    ).cte("filtered")
+
+    bucket = case(
+        *[(filtered.c.price_1_day < upper, i) for i, upper in enumerate(PRICE_BUCKETS)],
+        else_=len(PRICE_BUCKETS),
+    )
+    values = {
+        "category": filtered.c.category,
+        "color": filtered.c.color,
+        "size": filtered.c.size,
+        "available": filtered.c.available,
+        "price": bucket,
+    }
+    stmt = union_all(*[
+        select(literal(name).label("facet"), cast(value, String).label("value"), func.count().label("count"))
+        .group_by(value)
+        for name, value in values.items()
+    ])
+
+    result = {name: [] for name in FACETS}
+    for facet, value, count in db.execute(stmt):
+        if facet == "available":
+            value = None if value is None else value.lower() in ("1", "true", "t")
+        elif facet == "price":
+            value = price_bucket(int(value))
+        result[facet].append({"value": value, "count": count})
+
+    for facet in ("category", "color", "size", "available"):
+        result[facet].sort(key=lambda v: -v["count"])
+    result["price"].sort(key=lambda v: v["value"]["bucket"])
+    return result
@@ -0,0 +1,66 @@
+import re
+
+from sqlalchemy import Float, and_, case, cast, func, literal_column, or_, text
+
+import models
+
+SEARCH_COLUMNS = ("name", "description", "category", "color")
+
+# Relevance weights for the portable path, mirroring the tsvector weights below
+COLUMN_WEIGHTS = {"name": 4, "category": 2, "color": 2, "description": 1}
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(category, '') || ' ' || coalesce(color, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+
+def install(engine):
+    # The generated column and GIN indexes are Postgres-only; other dialects use the LIKE path
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for stmt in POSTGRES_DDL:
+            conn.execute(text(stmt))
+
+
+def tokenize(search: str):
+    return re.findall(r"\w+", search.lower())
+
+
+# Filters `query` to products matching `search`; returns (query, rank expression)
+def apply_search(query, db, search: str):
+    tokens = tokenize(search)
+    if not tokens:
+        return query, literal_column("0")
+
+    if db.get_bind().dialect.name == "postgresql":
+        vector = literal_column("products.search_vector")
+        # Every token must match, each as a prefix so partial words ("gow") still hit
+        tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+        # As double precision, so the value round-trips exactly through a page cursor
+        rank = cast(func.ts_rank(vector, tsquery) + func.similarity(models.Product.name, search), Float)
+        query = query.filter(or_(vector.op("@@")(tsquery), models.Product.name.op("%")(search)))
+        return query, rank
+
+    token_filters = []
+    rank = literal_column("0")
+    for token in tokens:
+        pattern = "%" + token.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        matches = {
+            col: func.lower(getattr(models.Product, col)).like(pattern, escape="\\")
+            for col in SEARCH_COLUMNS
+        }
+        token_filters.append(or_(*matches.values()))
+        for col, match in matches.items():
+            rank = rank + case((match, COLUMN_WEIGHTS[col]), else_=0)
+    return query.filter(and_(*token_filters)), rank
@@ -0,0 +1,91 @@
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_COMPRESS_SIZE = 1024
+
+# Clients may store responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*version) -> str:
+    digest = hashlib.blake2b(repr(version).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def dump_json(content) -> bytes:
+    # Same compact encoding JSONResponse uses
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+# A serialized JSON body with its ETag and lazily compressed variants
+class CachedBody:
+    __slots__ = ("body", "etag", "headers", "_encoded")
+
+    def __init__(self, content, etag: str, headers: dict = None):
+        self.body = dump_json(content)
+        self.etag = etag
+        self.headers = headers or {}
+        self._encoded = {}
+
+    def encoded(self, encoding: str) -> bytes:
+        # Racing threads may both compress; the result is identical so either write wins
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def choose_encoding(request: Request, size: int):
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_response(request: Request, cached: CachedBody) -> Response:
+    if not_modified(request, cached.etag):
+        return not_modified_response(cached.etag)
+
+    headers = {"ETag": cached.etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding", **cached.headers}
+    body = cached.body
+    encoding = choose_encoding(request, len(body))
+    if encoding:
+        body = cached.encoded(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,15 +1,16 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
-from sqlalchemy.orm import Session, joinedload
+from fastapi import FastAPI, Depends, HTTPException, status, Query, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload, load_only, noload
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 import os
-import shutil
-import uuid
 
-import models, schemas, database
+import models, schemas, database, pagination, fulltext, cache, http_cache, facets, media, bulk, quotes, versions
 
 models.Base.metadata.create_all(bind=database.engine)
+versions.install()
+fulltext.install(database.engine)
 
 app = FastAPI(title="Catalog Service")
 
@@ -19,25 +20,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Uploads directory
-UPLOAD_DIR = "uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+if not os.path.exists(media.UPLOAD_DIR):
+    os.makedirs(media.UPLOAD_DIR)
 
-app.mount("/static", StaticFiles(directory=UPLOAD_DIR), name="static")
+app.mount("/static", media.ImmutableStaticFiles(directory=media.UPLOAD_DIR), name="static")
+
+def cached_response(request: Request, db: Session, name: str, key: tuple, tags, load):
+    # The ETag comes from the write counter, so a revalidation costs one primary-key
+    # lookup and answers 304 before any rows are loaded. Keying the cache on the version
+    # also drops entries another worker's write made stale, without waiting for the TTL.
+    version = versions.current(db, name)
+    etag = http_cache.make_etag(key, version)
+    if http_cache.not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    cached = cache.catalog_cache.get_or_load((*key, version), tags, lambda: load(etag))
+    return http_cache.json_response(request, cached)
 
 @app.get("/categories", response_model=List[schemas.CategoryResponse])
-def list_categories(db: Session = Depends(database.get_db)):
-    return db.query(models.Category).all()
+def list_categories(request: Request, db: Session = Depends(database.get_db)):
+    def load(etag):
+        return http_cache.CachedBody([{"id": c.id, "name": c.name} for c in db.query(models.Category).all()], etag)
+
+    return cached_response(request, db, versions.CATEGORIES, ("categories",), [cache.CATEGORIES], load)
 
 @app.post("/categories", response_model=schemas.CategoryResponse, status_code=status.HTTP_201_CREATED)
 def create_category(category: schemas.CategoryCreate, db: Session = Depends(database.get_db)):
     db_cat = models.Category(name=category.name)
     db.add(db_cat)
+    versions.bump(db, versions.CATEGORIES)
     db.commit()
     db.refresh(db_cat)
+    cache.catalog_cache.invalidate(cache.CATEGORIES)
     return db_cat
 
 @app.delete("/categories/{cat_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -52,62 +69,219 @@ def delete_category(cat_id: int, db: Session = Depends(database.get_db)):
         raise HTTPException(status_code=400, detail="Cannot delete category while products are assigned to it")
         
     db.delete(cat)
+    versions.bump(db, versions.CATEGORIES)
     db.commit()
+    cache.catalog_cache.invalidate(cache.CATEGORIES)
     return None
 
 @app.post("/products", response_model=schemas.ProductResponse, status_code=status.HTTP_201_CREATED)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(database.get_db)):
     new_product = models.Product(**product.dict())
     db.add(new_product)
+    versions.bump(db, versions.PRODUCTS)
     db.commit()
     db.refresh(new_product)
+    cache.catalog_cache.invalidate(cache.PRODUCT_LISTS)
     return new_product
 
 @app.get("/products", response_model=List[schemas.ProductResponse])
 def list_products(
-    category: Optional[str] = None, 
+    request: Request,
+    filters: facets.ProductFilters = Depends(),
     search: Optional[str] = None, 
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = Query(None, pattern="^(id|price|relevance)$"),
+    fields: Optional[str] = None,
+    images: str = Query("all", pattern="^(all|primary|none)$"),
+    db: Session = Depends(database.get_db)
+):
+    projection = pagination.parse_fields(fields) or list(pagination.PRODUCT_FIELDS)
+    sort = sort or ("relevance" if search else "id")
+    if sort == "relevance" and not search:
+        raise HTTPException(status_code=400, detail="sort=relevance requires a search term")
+
+    def load(etag):
+        query = db.query(models.Product)
+        columns = [getattr(models.Product, f) for f in projection if f != "images"]
+        query = query.options(load_only(*columns))
+        if "images" not in projection or images == "none":
+            query = query.options(noload(models.Product.images))
+        elif images == "primary":
+            query = query.options(selectinload(models.Product.images.and_(models.ProductImage.is_primary == True)))
+        else:
+            query = query.options(selectinload(models.Product.images))
+
+        query = filters.apply(query)
+        rank = None
+        if search:
+            query, rank = fulltext.apply_search(query, db, search)
+
+        query = pagination.apply_keyset(query, sort, cursor, rank)
+        headers = {}
+        # Fetch one extra row to know whether another page exists
+        if sort == "relevance":
+            # The rank comes back with each row for the next cursor
+            rows = query.add_columns(rank).limit(limit + 1).all()
+        else:
+            rows = [(p, None) for p in query.limit(limit + 1).all()]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last, last_rank = rows[-1]
+            headers["X-Next-Cursor"] = pagination.encode_cursor(last, sort, last_rank)
+        products = [p for p, _ in rows]
+        return http_cache.CachedBody([pagination.serialize_product(p, projection) for p in products], etag, headers)
+
+    # Rows are serialized once on load; cache hits skip the query, validation and encoding
+    key = ("products", filters.key(), search, limit, cursor, sort, tuple(projection), images)
+    return cached_response(request, db, versions.PRODUCTS, key, [cache.PRODUCT_LISTS], load)
+
+@app.get("/products/facets", response_model=schemas.FacetsResponse)
+def product_facets(
+    request: Request,
+    filters: facets.ProductFilters = Depends(),
+    search: Optional[str] = None,
     db: Session = Depends(database.get_db)
 ):
-    query = db.query(models.Product).options(joinedload(models.Product.images))
-    if category:
-        query = query.filter(models.Product.category == category)
-    if search:
-        query = query.filter(models.Product.name.contains(search))
-    return query.all()
+    def load(etag):
+        query = filters.apply(db.query(models.Product))
+        if search:
+            query, _ = fulltext.apply_search(query, db, search)
+        return http_cache.CachedBody(facets.count_facets(db, query), etag)
+
+    key = ("facets", filters.key(), search)
+    return cached_response(request, db, versions.PRODUCTS, key, [cache.PRODUCT_LISTS], load)
+
+@app.post("/products/quote", response_model=schemas.QuoteResponse)
+def quote_products(quote_request: schemas.QuoteRequest, db: Session = Depends(database.get_db)):
+    if quote_request.end_date < quote_request.start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    days = (quote_request.end_date - quote_request.start_date).days + 1
+    product_ids = list(dict.fromkeys(quote_request.product_ids)) if quote_request.product_ids else None
+    result = quotes.quote(quotes.get_price_table(db), product_ids, days, sort=quote_request.sort)
+    return {"start_date": quote_request.start_date, "end_date": quote_request.end_date, "days": days, **result}
+
+@app.post("/products/import")
+async def import_products(request: Request):
+    # Body is NDJSON, one ProductImport per line; parsed as it streams and written in
+    # batches, each batch in its own transaction off the event loop
+    report = bulk.ImportReport()
+    batch = []
+    try:
+        async for line_no, raw in bulk.iter_lines(request):
+            row = bulk.parse_line(line_no, raw, report)
+            if row is not None:
+                batch.append((line_no, row))
+            if len(batch) >= bulk.IMPORT_BATCH_SIZE:
+                await run_in_threadpool(bulk.import_batch, batch, report)
+                batch = []
+        if batch:
+            await run_in_threadpool(bulk.import_batch, batch, report)
+    finally:
+        # Imports can touch any product or category; start the cache over
+        cache.catalog_cache.clear()
+    return report.as_dict()
+
+@app.get("/products/export")
+def export_products():
+    return StreamingResponse(bulk.export_lines(), media_type="application/x-ndjson")
 
 @app.get("/products/{product_id}", response_model=schemas.ProductResponse)
-def get_product(product_id: int, db: Session = Depends(database.get_db)):
-    product = db.query(models.Product).options(joinedload(models.Product.images)).filter(models.Product.id == product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
+def get_product(product_id: int, request: Request, db: Session = Depends(database.get_db)):
+    def load(etag):
+        product = db.query(models.Product).options(joinedload(models.Product.images)).filter(models.Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return http_cache.CachedBody(pagination.serialize_product(product, pagination.PRODUCT_FIELDS), etag)
+
+    key = ("product", product_id)
+    return cached_response(request, db, versions.PRODUCTS, key, [cache.product_tag(product_id)], load)
+
+def generate_variants(image_id: int, file_path: str):
+    # Runs after the upload response is sent; the resize itself happens in the process pool
+    try:
+        names = media.existing_variants(file_path)
+        if names is None:
+            names = media.get_executor().submit(media.render_variants, file_path).result()
+    except Exception as e:
+        print(f"Failed to generate variants for image {image_id}: {e}")
+        return
+
+    db = database.SessionLocal()
+    try:
+        image = db.query(models.ProductImage).filter(models.ProductImage.id == image_id).first()
+        if not image:
+            # Deleted while resizing; drop the variants only if nothing else shares the blob
+            digest = os.path.splitext(os.path.basename(file_path))[0]
+            blob = db.query(models.ImageBlob).filter(models.ImageBlob.digest == digest).with_for_update().first()
+            if blob is None:
+                media.remove_files(*[media.url_for(n) for n in names.values()])
+            db.commit()
+            return
+        image.thumbnail_url = media.url_for(names["thumbnail"])
+        image.medium_url = media.url_for(names["medium"])
+        versions.bump(db, versions.PRODUCTS)
+        db.commit()
+        cache.invalidate_product(image.product_id)
+    finally:
+        db.close()
+
+def product_exists(product_id: int) -> bool:
+    db = database.SessionLocal()
+    try:
+        return db.query(models.Product.id).filter(models.Product.id == product_id).first() is not None
+    finally:
+        db.close()
+
+def attach_image(product_id: int, digest: str, extension: str, tmp_path: str):
+    # The blocking half of an upload: check the file, store it and add the image row
+    media.verify_image(tmp_path)
+    db = database.SessionLocal()
+    try:
+        product = db.query(models.Product).filter(models.Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        # Files are named by content hash, so re-uploading the same photo reuses one blob
+        blob = media.acquire_blob(db, digest, f"{digest}{extension}")
+        file_path = media.store_blob(tmp_path, blob)
+
+        db_image = models.ProductImage(
+            product_id=product_id,
+            url=media.url_for(blob.file_name),
+            blob_digest=digest,
+            is_primary=len(product.images) == 0
+        )
+        db.add(db_image)
+        versions.bump(db, versions.PRODUCTS)
+        db.commit()
+        db.refresh(db_image)
+        return schemas.ProductImageResponse.model_validate(db_image), file_path
+    finally:
+        db.close()
 
 @app.post("/products/{product_id}/images/upload", response_model=schemas.ProductImageResponse)
-async def upload_image(product_id: int, file: UploadFile = File(...), db: Session = Depends(database.get_db)):
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
-    if not product:
+async def upload_image(product_id: int, request: Request, background_tasks: BackgroundTasks):
+    # The body is the image itself (Content-Type image/*), streamed straight into one temp
+    # file; an oversize upload is refused on its Content-Length or as soon as it passes the cap
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    media.check_content_length(request.headers.get("content-length"))
+    if not await run_in_threadpool(product_exists, product_id):
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    file_extension = os.path.splitext(file.filename)[1]
-    file_name = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, file_name)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # In catalog-service, the URL will be /api/catalog/static/filename
-    image_url = f"/api/catalog/static/{file_name}"
-    
-    db_image = models.ProductImage(
-        product_id=product_id,
-        url=image_url,
-        is_primary=len(product.images) == 0
-    )
-    db.add(db_image)
-    db.commit()
-    db.refresh(db_image)
-    return db_image
+
+    tmp_path = media.temp_path()
+    digest = await media.save_upload(request.stream(), tmp_path)
+    try:
+        image, file_path = await run_in_threadpool(
+            attach_image, product_id, digest, media.extension_for(content_type), tmp_path
+        )
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    cache.invalidate_product(product_id)
+    background_tasks.add_task(generate_variants, image.id, file_path)
+    return image
 
 @app.delete("/products/{product_id}/images/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_image(product_id: int, image_id: int, db: Session = Depends(database.get_db)):
@@ -118,14 +292,13 @@ def delete_image(product_id: int, image_id: int, db: Session = Depends(database.
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
         
-    # Delete file
-    file_name = image.url.split("/")[-1]
-    file_path = os.path.join(UPLOAD_DIR, file_name)
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    # Drop our reference; files go once no other image uses them
+    media.release_image(db, image)
         
     db.delete(image)
+    versions.bump(db, versions.PRODUCTS)
     db.commit()
+    cache.invalidate_product(product_id)
     return None
 
 @app.patch("/products/{product_id}", response_model=schemas.ProductResponse)
@@ -138,8 +311,10 @@ def update_product(product_id: int, product_update: schemas.ProductCreate, db: S
     for key, value in update_data.items():
         setattr(product, key, value)
     
+    versions.bump(db, versions.PRODUCTS)
     db.commit()
     db.refresh(product)
+    cache.invalidate_product(product_id)
     return product
 
 @app.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -147,10 +322,18 @@ def delete_product(product_id: int, db: Session = Depends(database.get_db)):
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    for image in product.images:
+        media.release_image(db, image)
     db.delete(product)
+    versions.bump(db, versions.PRODUCTS)
     db.commit()
+    cache.invalidate_product(product_id)
     return None
 
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.catalog_cache.stats()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
@@ -0,0 +1,206 @@
+import hashlib
+import mimetypes
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from fastapi.staticfiles import StaticFiles
+from PIL import Image, ImageOps
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+UPLOAD_DIR = "uploads"
+# In catalog-service, the URL will be /api/catalog/static/filename
+STATIC_URL_PREFIX = "/api/catalog/static/"
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+
+# Longest edge in pixels for each generated variant
+VARIANTS = {"thumbnail": 240, "medium": 960}
+
+# Stored files never change under a given name (blobs are named by content hash)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+class ImmutableStaticFiles(StaticFiles):
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code == 200:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def url_for(file_name: str) -> str:
+    return f"{STATIC_URL_PREFIX}{file_name}"
+
+
+def path_for(url: str) -> str:
+    return os.path.join(UPLOAD_DIR, url.split("/")[-1])
+
+
+def variant_name(file_name: str, variant: str) -> str:
+    return f"{os.path.splitext(file_name)[0]}_{variant}.webp"
+
+
+def temp_path() -> str:
+    return os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}")
+
+
+def too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Image too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)")
+
+
+def check_content_length(header: str = None):
+    # Refuses a declared oversize body before any of it is read
+    if header is not None and header.isdigit() and int(header) > MAX_UPLOAD_BYTES:
+        raise too_large()
+
+
+def extension_for(content_type: str) -> str:
+    return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+
+
+async def save_upload(chunks, dest_path: str) -> str:
+    # Writes the request body to `dest_path` as it arrives, so memory stays flat and the
+    # size cap applies mid-stream (bodies sent without a Content-Length included);
+    # returns the sha256 of the content
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        with open(dest_path, "wb") as out:
+            async for chunk in chunks:
+                written += len(chunk)
+                if written > MAX_UPLOAD_BYTES:
+                    raise too_large()
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return digest.hexdigest()
+
+
+def verify_image(path: str):
+    # content_type is whatever the client claimed; make sure PIL can actually read the file
+    # before it becomes a blob, rather than finding out in the background resize
+    try:
+        with Image.open(path) as img:
+            img.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="File is not a valid image")
+
+
+def acquire_blob(db, digest: str, file_name: str):
+    # Takes a reference on the blob for `digest`, creating it if needed. The row stays
+    # locked until the caller commits, which orders us against a concurrent release.
+    query = db.query(models.ImageBlob).filter(models.ImageBlob.digest == digest).with_for_update()
+    blob = query.first()
+    if blob is None:
+        try:
+            with db.begin_nested():
+                blob = models.ImageBlob(digest=digest, file_name=file_name, ref_count=0)
+                db.add(blob)
+        except IntegrityError:
+            # Another upload of the same content created it first
+            blob = query.first()
+    blob.ref_count += 1
+    return blob
+
+
+def store_blob(tmp_path: str, blob) -> str:
+    # Moves the upload into place, or drops it when identical content is already stored
+    file_path = os.path.join(UPLOAD_DIR, blob.file_name)
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+    return file_path
+
+
+def release_image(db, image):
+    # Call before deleting `image`, while its transaction is still open. Files are removed
+    # under the blob row lock so a concurrent upload of the same content can't lose them.
+    if image.blob_digest is None:
+        # Uploaded before content addressing: uuid-named, never shared
+        remove_files(image.url, image.thumbnail_url, image.medium_url)
+        return
+    blob = db.query(models.ImageBlob).filter(models.ImageBlob.digest == image.blob_digest).with_for_update().first()
+    if blob is None:
+        return
+    blob.ref_count -= 1
+    if blob.ref_count <= 0:
+        db.delete(blob)
+        remove_files(
+            url_for(blob.file_name),
+            *[url_for(variant_name(blob.file_name, v)) for v in VARIANTS],
+        )
+
+
+def reference_stored_image(db, image):
+    # For image rows created from an existing URL (bulk import): if the URL names a stored
+    # blob, count the new row as a reference and reuse the blob's variants
+    if not image.url or not image.url.startswith(STATIC_URL_PREFIX):
+        return
+    file_name = image.url.split("/")[-1]
+    digest = os.path.splitext(file_name)[0]
+    blob = db.query(models.ImageBlob).filter(models.ImageBlob.digest == digest).with_for_update().first()
+    if blob is None or blob.file_name != file_name:
+        return
+    blob.ref_count += 1
+    image.blob_digest = digest
+    names = existing_variants(os.path.join(UPLOAD_DIR, file_name))
+    if names:
+        image.thumbnail_url = url_for(names["thumbnail"])
+        image.medium_url = url_for(names["medium"])
+
+
+def render_variants(src_path: str) -> dict:
+    # Runs in a worker process; returns {variant name: file name}
+    file_name = os.path.basename(src_path)
+    names = {}
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        for name, edge in VARIANTS.items():
+            names[name] = variant_name(file_name, name)
+            out_path = os.path.join(os.path.dirname(src_path), names[name])
+            if os.path.exists(out_path):
+                continue
+            variant = img.copy()
+            variant.thumbnail((edge, edge))
+            # Write then rename so readers never see a partial file
+            tmp = f"{out_path}.{uuid.uuid4().hex}.tmp"
+            variant.save(tmp, "WEBP", quality=80)
+            os.replace(tmp, out_path)
+    return names
+
+
+def existing_variants(src_path: str):
+    file_name = os.path.basename(src_path)
+    names = {name: variant_name(file_name, name) for name in VARIANTS}
+    directory = os.path.dirname(src_path)
+    if all(os.path.exists(os.path.join(directory, n)) for n in names.values()):
+        return names
+    return None
+
+
+def remove_files(*urls):
+    for url in urls:
+        # Seeded products may point at external URLs; only local uploads are ours to delete
+        if not url or not url.startswith(STATIC_URL_PREFIX):
+            continue
+        file_path = path_for(url)
+        if os.path.exists(file_path):
+            os.remove(file_path)
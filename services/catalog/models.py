@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Boolean, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -19,19 +19,47 @@ class Product(Base):
     price_1_day = Column(Float)
     price_subsequent_day = Column(Float)
     
-    available = Column(Boolean, default=True)
-    color = Column(String, nullable=True)
-    size = Column(String, nullable=True)
+    available = Column(Boolean, default=True, index=True)
+    color = Column(String, nullable=True, index=True)
+    size = Column(String, nullable=True, index=True)
 
     images = relationship("ProductImage", back_populates="product", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Keyset pagination by price: ORDER BY price_1_day, id
+        Index("ix_products_price_1_day_id", "price_1_day", "id"),
+        # Category page narrowed by price range
+        Index("ix_products_category_price_1_day", "category", "price_1_day"),
+    )
+
 class ProductImage(Base):
     __tablename__ = "product_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"))
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
     url = Column(String)
+    # Content hash of the stored file; null for uploads that predate the blob store
+    blob_digest = Column(String, nullable=True, index=True)
+    # Filled in by the background resize job once the variants exist
+    thumbnail_url = Column(String, nullable=True)
+    medium_url = Column(String, nullable=True)
     is_primary = Column(Boolean, default=False)
 
     product = relationship("Product", back_populates="images")
 
+class ImageBlob(Base):
+    __tablename__ = "image_blobs"
+
+    # sha256 of the file content; the file is stored as <digest><ext>
+    digest = Column(String, primary_key=True)
+    file_name = Column(String)
+    # Number of product_images rows pointing at this file
+    ref_count = Column(Integer, default=0)
+
+class CatalogVersion(Base):
+    # One write counter per kind of catalog data, bumped in the same transaction as every
+    # write; the HTTP ETags are built from it so revalidation never loads the rows
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,87 @@
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import and_, desc, or_
+
+import models
+
+# Used when a listing request gives no limit, so no response grows with the catalog
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Keyset columns per sort order; id is always the last column so the key is unique.
+# "rank" is the search rank, computed per query and sorted highest first.
+SORT_KEYS = {
+    "id": ("id",),
+    "price": ("price_1_day", "id"),
+    "relevance": ("rank", "id"),
+}
+
+PRODUCT_FIELDS = (
+    "id", "name", "description", "category", "price_1_day",
+    "price_subsequent_day", "available", "color", "size", "images",
+)
+
+
+def encode_cursor(product, sort: str, rank=None) -> str:
+    values = [rank if col == "rank" else getattr(product, col) for col in SORT_KEYS[sort]]
+    raw = json.dumps([sort, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort or len(values) != len(SORT_KEYS[sort]):
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return values
+
+
+def apply_keyset(query, sort: str, cursor: str = None, rank=None):
+    columns = [rank if col == "rank" else getattr(models.Product, col) for col in SORT_KEYS[sort]]
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), spelled out for SQLite;
+        # the rank runs the other way
+        clauses = []
+        for i, column in enumerate(columns):
+            equal = [columns[j] == values[j] for j in range(i)]
+            after = column < values[i] if column is rank else column > values[i]
+            clauses.append(and_(*equal, after))
+        query = query.filter(or_(*clauses))
+    return query.order_by(*(desc(c) if c is rank else c for c in columns))
+
+
+def parse_fields(fields: str = None):
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id is needed to build the next cursor and to key images
+    return ["id"] + [f for f in requested if f != "id"]
+
+
+def serialize_image(image) -> dict:
+    return {
+        "id": image.id,
+        "url": image.url,
+        "is_primary": image.is_primary,
+        "thumbnail_url": image.thumbnail_url,
+        "medium_url": image.medium_url,
+    }
+
+
+def serialize_product(product, fields) -> dict:
+    data = {}
+    for field in fields:
+        if field == "images":
+            data["images"] = [serialize_image(img) for img in product.images]
+        else:
+            data[field] = getattr(product, field)
+    return data
@@ -0,0 +1,58 @@
+import numpy as np
+
+import models, cache
+
+PRICE_TABLE_KEY = ("price_table",)
+
+
+class PriceTable:
+    # Every priced product as parallel arrays sorted by id, so lookups are one searchsorted
+    def __init__(self, rows):
+        self.ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        self.price_1_day = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+        self.price_subsequent_day = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+
+    def positions(self, product_ids):
+        # Returns (positions of the known ids, mask of which requested ids were found)
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, product_ids)
+        pos = np.minimum(pos, max(len(self.ids) - 1, 0))
+        found = (self.ids[pos] == product_ids) if len(self.ids) else np.zeros(len(product_ids), dtype=bool)
+        return pos[found], found
+
+
+def load_price_table(db) -> PriceTable:
+    rows = db.query(
+        models.Product.id, models.Product.price_1_day, models.Product.price_subsequent_day
+    ).filter(
+        models.Product.price_1_day.isnot(None),
+        models.Product.price_subsequent_day.isnot(None),
+    ).order_by(models.Product.id).all()
+    return PriceTable(rows)
+
+
+def get_price_table(db) -> PriceTable:
+    # Any product write invalidates PRODUCT_LISTS, which drops the table with it
+    return cache.catalog_cache.get_or_load(PRICE_TABLE_KEY, [cache.PRODUCT_LISTS], lambda: load_price_table(db))
+
+
+def quote(table: PriceTable, product_ids, days: int, sort: bool = False) -> dict:
+    # Same rule as the product page: first day at price_1_day, every further day at
+    # price_subsequent_day
+    if product_ids is None:
+        pos = np.arange(len(table.ids))
+        missing = []
+    else:
+        requested = np.asarray(product_ids, dtype=np.int64)
+        pos, found = table.positions(requested)
+        missing = requested[~found].tolist()
+
+    totals = table.price_1_day[pos] + (days - 1) * table.price_subsequent_day[pos]
+    if sort:
+        # Stable, so equal totals keep their input order
+        order = np.argsort(totals, kind="stable")
+        pos, totals = pos[order], totals[order]
+
+    # Parallel arrays rather than one object per product: serializing thousands of small
+    # dicts would cost more than the pricing itself
+    return {"product_ids": table.ids[pos].tolist(), "totals": totals.tolist(), "missing": missing}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+from datetime import date
 
 class CategoryBase(BaseModel):
     name: str
@@ -19,6 +20,8 @@ class ProductImageBase(BaseModel):
 
 class ProductImageResponse(ProductImageBase):
     id: int
+    thumbnail_url: Optional[str] = None
+    medium_url: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -35,6 +38,12 @@ class ProductBase(BaseModel):
 class ProductCreate(ProductBase):
     pass
 
+class ProductImport(ProductBase):
+    # Rows with an existing id update that product; any other row is inserted, keeping its id
+    id: Optional[int] = None
+    available: bool = True
+    images: List[ProductImageBase] = []
+
 class ProductResponse(ProductBase):
     id: int
     available: bool
@@ -43,3 +52,35 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+
+class FacetCount(BaseModel):
+    value: Any
+    count: int
+
+class FacetsResponse(BaseModel):
+    category: List[FacetCount]
+    color: List[FacetCount]
+    size: List[FacetCount]
+    available: List[FacetCount]
+    price: List[FacetCount]
+
+# Per quote request; the whole catalog can still be quoted by leaving product_ids out
+MAX_QUOTE_PRODUCTS = 10000
+
+class QuoteRequest(BaseModel):
+    start_date: date
+    end_date: date
+    # Leave out to quote every product
+    product_ids: Optional[List[int]] = Field(None, min_length=1, max_length=MAX_QUOTE_PRODUCTS)
+    # Cheapest first
+    sort: bool = False
+
+class QuoteResponse(BaseModel):
+    start_date: date
+    end_date: date
+    days: int
+    # totals[i] is the price of product_ids[i] for the whole range
+    product_ids: List[int]
+    totals: List[float]
+    # Requested ids that don't exist or have no price
+    missing: List[int]
@@ -2,7 +2,7 @@ import os
 import sys
 from sqlalchemy.orm import Session
 from database import SessionLocal, engine
-import models
+import models, versions
 
 # Add current directory to path if needed
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -20,8 +20,9 @@ def seed():
 
         # Seed Categories
         categories = ["Party Wear", "Traditional", "Casual", "Premium", "Bridal", "Accessories"]
+        existing_categories = {name for (name,) in db.query(models.Category.name).filter(models.Category.name.in_(categories))}
         for cat_name in categories:
-            if not db.query(models.Category).filter(models.Category.name == cat_name).first():
+            if cat_name not in existing_categories:
                 db.add(models.Category(name=cat_name))
         db.commit()
 
@@ -99,10 +100,11 @@ def seed():
             }
         ]
 
+        names = [p["name"] for p in dummy_products]
+        existing_names = {name for (name,) in db.query(models.Product.name).filter(models.Product.name.in_(names))}
         for p_data in dummy_products:
             image_url = p_data.pop("image_url")
-            existing_product = db.query(models.Product).filter(models.Product.name == p_data["name"]).first()
-            if not existing_product:
+            if p_data["name"] not in existing_names:
                 new_product = models.Product(**p_data)
                 db.add(new_product)
                 db.flush() # Get ID
@@ -118,6 +120,8 @@ def seed():
                         is_primary=False
                     ))
         
+        # Running services cache by version; make them notice the new rows
+        versions.bump(db, versions.PRODUCTS, versions.CATEGORIES)
         db.commit()
         print("Database Seeded Successfully!")
     except Exception as e:
@@ -0,0 +1,42 @@
+import time
+
+from sqlalchemy.exc import IntegrityError
+
+import models, database
+
+PRODUCTS = "products"
+CATEGORIES = "categories"
+
+Version = models.CatalogVersion
+
+
+def bump(db, *names):
+    # In-place increment in the caller's transaction; call it last, just before the
+    # commit, so the row lock is held only briefly
+    db.query(Version).filter(Version.name.in_(names)).update(
+        {Version.version: Version.version + 1}, synchronize_session=False
+    )
+
+
+def current(db, name: str) -> int:
+    version = db.query(Version.version).filter(Version.name == name).scalar()
+    return version or 0
+
+
+def install():
+    # Counters start at the creation time in ms, so a recreated database doesn't hand
+    # out ETags a client already holds for different data. Two workers starting together
+    # may both insert; the loser's primary-key error is ignored.
+    db = database.SessionLocal()
+    try:
+        existing = {n for (n,) in db.query(Version.name)}
+        missing = [n for n in (PRODUCTS, CATEGORIES) if n not in existing]
+        if missing:
+            start = int(time.time() * 1000)
+            db.add_all(Version(name=n, version=start) for n in missing)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+    finally:
+        db.close()
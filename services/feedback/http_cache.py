@@ -0,0 +1,74 @@
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+MIN_COMPRESS_SIZE = 1024
+
+# Clients may store responses but must revalidate them with If-None-Match
+CACHE_CONTROL = "no-cache"
+
+
+def make_etag(*version) -> str:
+    digest = hashlib.blake2b(repr(version).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def dump_json(content) -> bytes:
+    # Same compact encoding JSONResponse uses
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+
+def choose_encoding(request: Request, size: int):
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def json_response(request: Request, content, etag: str, extra_headers: dict = None) -> Response:
+    if not_modified(request, etag):
+        return not_modified_response(etag)
+
+    body = dump_json(content)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding", **(extra_headers or {})}
+    encoding = choose_encoding(request, len(body))
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,11 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Query, Response
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 
-import models, schemas, database
+import models, schemas, database, http_cache, tokens, pagination, ratings
 
 models.Base.metadata.create_all(bind=database.engine)
+models.install(database.engine)
+ratings.backfill_if_empty()
 
 app = FastAPI(title="Feedback Service")
 
@@ -15,42 +19,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+def is_duplicate_review(error: IntegrityError) -> bool:
+    # Postgres names the violated index; SQLite only lists its columns
+    message = str(error.orig)
+    return "uq_reviews_user_id_product_id" in message or "reviews.user_id, reviews.product_id" in message
+
 @app.post("/reviews", response_model=schemas.ReviewResponse, status_code=status.HTTP_201_CREATED)
-def create_review(review: schemas.ReviewCreate, db: Session = Depends(database.get_db)):
+def create_review(
+    review: schemas.ReviewCreate,
+    claims: dict = Depends(tokens.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    tokens.ensure_same_user(claims, review.user_id)
     if review.rating < 1 or review.rating > 5:
         raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
     
-    # Check if user already reviewed this product
-    existing = db.query(models.Review).filter(
-        models.Review.user_id == review.user_id,
-        models.Review.product_id == review.product_id
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="You have already reviewed this product")
-        
     new_review = models.Review(
         **review.dict(), 
         original_comment=review.comment,
         original_rating=review.rating
     )
     db.add(new_review)
+    try:
+        # The unique (user_id, product_id) index rejects a second review
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_duplicate_review(e):
+            raise
+        raise HTTPException(status_code=400, detail="You have already reviewed this product")
+    ratings.apply(db, new_review.product_id, added=new_review.rating)
     db.commit()
     db.refresh(new_review)
     return new_review
 
 @app.patch("/reviews/{review_id}", response_model=schemas.ReviewResponse)
-def update_review(review_id: int, review_update: schemas.ReviewUpdate, db: Session = Depends(database.get_db)):
-    db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
+def update_review(
+    review_id: int,
+    review_update: schemas.ReviewUpdate,
+    claims: dict = Depends(tokens.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    # Locked so concurrent writes to this review apply their rating deltas one at a time
+    db_review = db.query(models.Review).filter(models.Review.id == review_id).with_for_update().first()
     if not db_review:
         raise HTTPException(status_code=404, detail="Review not found")
+    tokens.ensure_same_user(claims, db_review.user_id, "Not your review")
     
     if review_update.comment is not None:
         db_review.comment = review_update.comment
     if review_update.rating is not None:
         if review_update.rating < 1 or review_update.rating > 5:
             raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
+        ratings.apply(db, db_review.product_id, removed=db_review.rating, added=review_update.rating)
         db_review.rating = review_update.rating
         
     db.commit()
@@ -58,11 +82,21 @@ def update_review(review_id: int, review_update: schemas.ReviewUpdate, db: Sessi
     return db_review
 
 @app.post("/reviews/{review_id}/revert", response_model=schemas.ReviewResponse)
-def revert_review(review_id: int, db: Session = Depends(database.get_db)):
-    db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
+def revert_review(
+    review_id: int,
+    claims: dict = Depends(tokens.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    # Locked so concurrent writes to this review apply their rating deltas one at a time
+    db_review = db.query(models.Review).filter(models.Review.id == review_id).with_for_update().first()
     if not db_review:
         raise HTTPException(status_code=404, detail="Review not found")
+    tokens.ensure_same_user(claims, db_review.user_id, "Not your review")
+    if db_review.original_rating is None:
+        # Written before original_rating existed; reverting would blank the rating
+        raise HTTPException(status_code=400, detail="This review has no original version to revert to")
     
+    ratings.apply(db, db_review.product_id, removed=db_review.rating, added=db_review.original_rating)
     db_review.comment = db_review.original_comment
     db_review.rating = db_review.original_rating
     db.commit()
@@ -70,24 +104,125 @@ def revert_review(review_id: int, db: Session = Depends(database.get_db)):
     return db_review
 
 @app.delete("/reviews/{review_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_review(review_id: int, db: Session = Depends(database.get_db)):
-    db_review = db.query(models.Review).filter(models.Review.id == review_id).first()
+def delete_review(
+    review_id: int,
+    claims: dict = Depends(tokens.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    # Locked so concurrent writes to this review apply their rating deltas one at a time
+    db_review = db.query(models.Review).filter(models.Review.id == review_id).with_for_update().first()
     if not db_review:
         raise HTTPException(status_code=404, detail="Review not found")
+    tokens.ensure_same_user(claims, db_review.user_id, "Not your review")
     
+    ratings.apply(db, db_review.product_id, removed=db_review.rating)
     db.delete(db_review)
     db.commit()
     return None
 
+def reviews_version(query):
+    # count catches deletes, max(id) catches inserts, max(updated_at) catches edits
+    return query.with_entities(
+        func.count(models.Review.id),
+        func.max(models.Review.id),
+        func.max(models.Review.updated_at),
+    ).one()
+
+def reviews_response(request: Request, query, scope):
+    etag = http_cache.make_etag(scope, *reviews_version(query))
+    if http_cache.not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+    content = [
+        schemas.ReviewResponse.model_validate(r).model_dump(mode="json")
+        for r in query.all()
+    ]
+    return http_cache.json_response(request, content, etag)
+
+REVIEWS_PAGE_SIZE = 20
+REVIEW_KEYSET = (models.Review.created_at, models.Review.id)
+
 @app.get("/reviews", response_model=List[schemas.ReviewResponse])
-def get_all_reviews(db: Session = Depends(database.get_db)):
-    return db.query(models.Review).all()
+def get_all_reviews(request: Request, db: Session = Depends(database.get_db)):
+    return reviews_response(request, db.query(models.Review), "all")
 
-@app.get("/reviews/{product_id}", response_model=List[schemas.ReviewResponse])
-def get_reviews(product_id: int, db: Session = Depends(database.get_db)):
-    reviews = db.query(models.Review).filter(models.Review.product_id == product_id).all()
+@app.get("/ratings", response_model=List[schemas.RatingAggregate])
+def get_ratings(product_ids: str = Query(..., description="Comma-separated product ids"), db: Session = Depends(database.get_db)):
+    try:
+        ids = [int(pid) for pid in product_ids.split(",") if pid.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="product_ids must be comma-separated integers")
+    if len(ids) > ratings.MAX_BATCH_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"At most {ratings.MAX_BATCH_PRODUCTS} product ids per request")
+    return ratings.get_many(db, ids)
+
+# Number of newest reviews returned by /admin/summary
+SUMMARY_RECENT = 5
+
+@app.get("/admin/reviews", response_model=List[schemas.ReviewResponse])
+def admin_list_reviews(
+    response: Response,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    product_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    db: Session = Depends(database.get_db)
+):
+    # Newest first; the next page is named by the X-Next-Cursor header
+    query = db.query(models.Review)
+    if product_id is not None:
+        query = query.filter(models.Review.product_id == product_id)
+    if user_id is not None:
+        query = query.filter(models.Review.user_id == user_id)
+    if rating is not None:
+        query = query.filter(models.Review.rating == rating)
+    reviews, next_cursor = pagination.newest_first(query, (models.Review.id,), limit, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return reviews
 
+@app.get("/admin/summary", response_model=schemas.ReviewSummary)
+def admin_summary(db: Session = Depends(database.get_db)):
+    # Summed from the per-product aggregates, so the cost follows the number of reviewed
+    # products rather than the number of reviews
+    histogram = ratings.totals(db)
+    total = sum(histogram.values())
+    average = sum(r * n for r, n in histogram.items()) / total if total else None
+    recent = db.query(models.Review).order_by(models.Review.id.desc()).limit(SUMMARY_RECENT).all()
+    return {"reviews": total, "average_rating": average, "ratings": histogram, "recent": recent}
+
+@app.get("/reviews/{product_id}", response_model=List[schemas.ReviewResponse])
+def get_reviews(
+    product_id: int,
+    request: Request,
+    limit: int = Query(REVIEWS_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    min_rating: Optional[int] = Query(None, ge=1, le=5),
+    user_id: Optional[int] = None,
+    db: Session = Depends(database.get_db)
+):
+    # Newest first in (created_at, id) keyset pages off ix_reviews_product_id_created_at;
+    # the next page is named by the X-Next-Cursor header
+    product_reviews = db.query(models.Review).filter(models.Review.product_id == product_id)
+    scope = ("product", product_id, limit, cursor, rating, min_rating, user_id)
+    etag = http_cache.make_etag(scope, *reviews_version(product_reviews))
+    if http_cache.not_modified(request, etag):
+        return http_cache.not_modified_response(etag)
+
+    query = product_reviews
+    if rating is not None:
+        query = query.filter(models.Review.rating == rating)
+    if min_rating is not None:
+        query = query.filter(models.Review.rating >= min_rating)
+    if user_id is not None:
+        # At most one row, found through the unique (user_id, product_id) index
+        query = query.filter(models.Review.user_id == user_id)
+    reviews, next_cursor = pagination.newest_first(query, REVIEW_KEYSET, limit, cursor)
+    content = [schemas.ReviewResponse.model_validate(r).model_dump(mode="json") for r in reviews]
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return http_cache.json_response(request, content, etag, headers)
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
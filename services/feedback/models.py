@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, inspect
+from sqlalchemy.exc import SQLAlchemyError
 from database import Base
 from datetime import datetime
 
@@ -6,10 +7,51 @@ class Review(Base):
     __tablename__ = "reviews"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, index=True)
-    user_id = Column(Integer, index=True)
-    rating = Column(Integer)
+    product_id = Column(Integer)
+    user_id = Column(Integer)
+    rating = Column(Integer, index=True)
     comment = Column(Text, nullable=True)
     original_comment = Column(Text, nullable=True)
     original_rating = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every write; part of the data version behind review ETags
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # One review per user per product, enforced by the database rather than a lookup
+        Index("uq_reviews_user_id_product_id", "user_id", "product_id", unique=True),
+        # A product's reviews newest first, in (created_at, id) keyset pages
+        Index("ix_reviews_product_id_created_at", "product_id", "created_at", "id"),
+    )
+
+def install(engine):
+    # create_all skips tables that already exist, indexes included, so add any missing
+    # review index here. Startup fails if one can't be built: without the unique index
+    # create_review would accept duplicate reviews.
+    for index in Review.__table__.indexes:
+        try:
+            with engine.begin() as conn:
+                index.create(bind=conn, checkfirst=True)
+        except SQLAlchemyError as e:
+            # Another worker starting at the same time may have just built it
+            if index.name in {i["name"] for i in inspect(engine).get_indexes(Review.__tablename__)}:
+                continue
+            raise RuntimeError(
+                f"Could not create index {index.name}; if users have duplicate reviews, "
+                f"run fix_db.py to remove them first"
+            ) from e
+
+class RatingAggregate(Base):
+    # Per product review totals, kept in step with reviews by ratings.apply in the same
+    # transaction as every review write
+    __tablename__ = "rating_aggregates"
+
+    product_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    # Histogram: number of reviews with each rating
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
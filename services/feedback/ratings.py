@@ -0,0 +1,116 @@
+import argparse
+import os
+import sys
+
+from sqlalchemy import case, func, insert, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Add current directory to path if needed
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import models, database
+
+RATINGS = range(1, 6)
+# Per /ratings request
+MAX_BATCH_PRODUCTS = 500
+
+# Advisory lock held for the backfill transaction; rental's booking locks use 1011
+RATINGS_LOCK_NAMESPACE = 1024
+BACKFILL_LOCK_SQL = text(f"SELECT pg_advisory_xact_lock({RATINGS_LOCK_NAMESPACE}, 0)")
+
+Aggregate = models.RatingAggregate
+HISTOGRAM = {r: getattr(Aggregate, f"rating_{r}") for r in RATINGS}
+
+
+def apply(db, product_id: int, removed: int = None, added: int = None):
+    # Moves one review's rating out of / into the product's totals: creating passes only
+    # `added`, deleting only `removed`, editing both. Runs in the caller's transaction,
+    # so the totals commit or roll back with the review itself.
+    if removed == added:
+        return
+    count = (added is not None) - (removed is not None)
+    values = {"count": count, "rating_sum": (added or 0) - (removed or 0)}
+    for r in RATINGS:
+        values[f"rating_{r}"] = (r == added) - (r == removed)
+
+    # One upsert: the row is created on the first review and otherwise incremented in
+    # place, so concurrent writers never lose an update
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(Aggregate).values(product_id=product_id, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Aggregate.product_id],
+        set_={name: getattr(Aggregate, name) + delta for name, delta in values.items()},
+    )
+    db.execute(stmt)
+
+
+def serialize(product_id: int, row) -> dict:
+    if row is None or not row.count:
+        return {"product_id": product_id, "count": 0, "average": None, "histogram": {r: 0 for r in RATINGS}}
+    return {
+        "product_id": product_id,
+        "count": row.count,
+        "average": round(row.rating_sum / row.count, 2),
+        "histogram": {r: getattr(row, f"rating_{r}") for r in RATINGS},
+    }
+
+
+def get_many(db, product_ids) -> list:
+    # One primary key lookup per product, in the order asked; unreviewed products get zeros
+    rows = {
+        row.product_id: row
+        for row in db.query(Aggregate).filter(Aggregate.product_id.in_(set(product_ids)))
+    }
+    return [serialize(pid, rows.get(pid)) for pid in product_ids]
+
+
+def totals(db) -> dict:
+    # Whole-catalog histogram from the per-product rows; one row per product, not per review
+    sums = db.query(*(func.coalesce(func.sum(column), 0) for column in HISTOGRAM.values())).one()
+    return dict(zip(RATINGS, sums))
+
+
+def rebuild(db):
+    # Recomputes every row from the reviews table. Needed once for reviews written before
+    # aggregates existed; safe to rerun, but writes made while it runs may be lost.
+    review = models.Review
+    db.query(Aggregate).delete()
+    db.execute(insert(Aggregate).from_select(
+        ["product_id", "count", "rating_sum", *(f"rating_{r}" for r in RATINGS)],
+        select(
+            review.product_id,
+            func.count(review.id),
+            func.coalesce(func.sum(review.rating), 0),
+            *(func.sum(case((review.rating == r, 1), else_=0)) for r in RATINGS),
+        ).where(review.product_id.isnot(None), review.rating.isnot(None)).group_by(review.product_id),
+    ))
+    db.commit()
+
+
+def backfill_if_empty():
+    # Workers start together; on Postgres the first one to take the lock builds the table
+    # and the rest wait for its commit and then find it filled
+    db = database.SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(BACKFILL_LOCK_SQL)
+        if db.query(Aggregate).first() is None and db.query(models.Review).first() is not None:
+            print("Building rating aggregates from existing reviews")
+            rebuild(db)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild per-product rating aggregates from reviews")
+    parser.parse_args()
+    db = database.SessionLocal()
+    try:
+        rebuild(db)
+        print(f"Rebuilt aggregates for {db.query(Aggregate).count()} products")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
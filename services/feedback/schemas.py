@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class ReviewBase(BaseModel):
@@ -23,3 +23,17 @@ class ReviewResponse(ReviewBase):
 
     class Config:
         from_attributes = True
+
+class ReviewSummary(BaseModel):
+    reviews: int
+    average_rating: Optional[float] = None
+    # rating -> number of reviews, for 1 through 5
+    ratings: Dict[int, int]
+    recent: List[ReviewResponse]
+
+class RatingAggregate(BaseModel):
+    product_id: int
+    count: int
+    average: Optional[float] = None
+    # rating -> number of reviews, for 1 through 5
+    histogram: Dict[int, int]
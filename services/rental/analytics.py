@@ -0,0 +1,195 @@
+import argparse
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, inspect, select, text
+
+# Add current directory to path if needed
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import models, database, intervals
+
+# Point this at a read replica to keep analytics off the primary entirely
+ANALYTICS_DATABASE_URL = os.getenv("ANALYTICS_DATABASE_URL")
+# Bounds the products x days difference array held at once (int64 cells, ~32 MB)
+MAX_CELLS = int(os.getenv("ANALYTICS_MAX_CELLS", 4_000_000))
+
+PERIODS = ("week", "month")
+GROUPS = ("product", "category")
+UNCATEGORIZED = "Uncategorized"
+
+_engine = None
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(ANALYTICS_DATABASE_URL) if ANALYTICS_DATABASE_URL else database.engine
+    return _engine
+
+
+@contextmanager
+def snapshot():
+    # One read-only REPEATABLE READ transaction on Postgres: every query sees the same
+    # snapshot and, being plain MVCC reads, never waits on or blocks booking writes
+    with get_engine().connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+        with conn.begin():
+            yield conn
+
+
+def period_bounds(window_start: date, window_end: date, period: str):
+    # Calendar weeks (Monday first) or months, clipped to the window
+    bounds = []
+    start = window_start
+    while start <= window_end:
+        if period == "week":
+            next_start = start - timedelta(days=start.weekday()) + timedelta(days=7)
+        else:
+            next_start = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        end = min(next_start - timedelta(days=1), window_end)
+        bounds.append((start, end))
+        start = next_start
+    return bounds
+
+
+def load_intervals(conn, window_start: date, window_end: date, include_blocks: bool):
+    # Returns (product_ids, start offsets, end offsets) as arrays, clipped to the window;
+    # offsets are inclusive day numbers counted from window_start
+    booking = models.RentalBooking
+    stmt = select(booking.product_id, booking.start_date, booking.end_date).where(
+        booking.status == "confirmed",
+        booking.end_date >= window_start,
+        booking.start_date <= window_end,
+    )
+    if not include_blocks:
+        stmt = stmt.where(booking.is_block.isnot(True))
+    rows = conn.execute(stmt).all()
+    if not rows:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+
+    product_ids, starts, ends = zip(*rows)
+    origin = np.datetime64(window_start, "D")
+    last = (window_end - window_start).days
+    starts = (np.array(starts, dtype="datetime64[D]") - origin).astype(np.int64)
+    ends = (np.array(ends, dtype="datetime64[D]") - origin).astype(np.int64)
+    return np.array(product_ids, dtype=np.int64), np.maximum(starts, 0), np.minimum(ends, last)
+
+
+def load_categories(conn) -> dict:
+    # The catalog's products table lives in the same database; without it every product
+    # is reported as uncategorized
+    if not inspect(conn).has_table("products"):
+        return {}
+    return {product_id: category for product_id, category in conn.execute(text("SELECT id, category FROM products"))}
+
+
+def booked_days(product_index, starts, ends, n_products: int, n_days: int, period_offsets):
+    # Days occupied per product per period. Each interval adds +1 at its first day and -1
+    # after its last in a difference array; a cumulative sum along the day axis gives how
+    # many bookings cover each day, so overlapping rows are never double counted.
+    booked = np.zeros((n_products, len(period_offsets)), dtype=np.int64)
+    if n_products == 0:
+        return booked
+    width = n_days + 1
+    order = np.argsort(product_index, kind="stable")
+    product_index, starts, ends = product_index[order], starts[order], ends[order]
+    chunk = max(1, MAX_CELLS // width)
+    for lo in range(0, n_products, chunk):
+        hi = min(lo + chunk, n_products)
+        a, b = np.searchsorted(product_index, [lo, hi])
+        rows = product_index[a:b] - lo
+        size = (hi - lo) * width
+        diff = (
+            np.bincount(rows * width + starts[a:b], minlength=size)
+            - np.bincount(rows * width + ends[a:b] + 1, minlength=size)
+        ).reshape(hi - lo, width)
+        occupied = np.cumsum(diff[:, :n_days], axis=1) > 0
+        booked[lo:hi] = np.add.reduceat(occupied, period_offsets, axis=1, dtype=np.int64)
+    return booked
+
+
+def occupancy(window_start: date, window_end: date, period: str = "month", group: str = "product", include_blocks: bool = False) -> dict:
+    with snapshot() as conn:
+        product_ids, starts, ends = load_intervals(conn, window_start, window_end, include_blocks)
+        categories = load_categories(conn)
+
+    # Products with no bookings at all are the under-utilized ones, so they count too
+    products = np.union1d(np.fromiter(categories.keys(), dtype=np.int64, count=len(categories)), product_ids)
+    product_index = np.searchsorted(products, product_ids)
+
+    bounds = period_bounds(window_start, window_end, period)
+    period_offsets = np.array([(start - window_start).days for start, _ in bounds], dtype=np.int64)
+    period_days = np.array([(end - start).days + 1 for start, end in bounds], dtype=np.int64)
+    n_days = (window_end - window_start).days + 1
+    booked = booked_days(product_index, starts, ends, len(products), n_days, period_offsets)
+
+    if group == "category":
+        names = np.array([categories.get(int(p)) or UNCATEGORIZED for p in products], dtype=object)
+        keys, category_index = np.unique(names, return_inverse=True)
+        grouped = np.zeros((len(keys), len(bounds)), dtype=np.int64)
+        np.add.at(grouped, category_index, booked)
+        members = np.bincount(category_index, minlength=len(keys))
+        rows = [
+            {"category": str(key), "products": int(count)}
+            for key, count in zip(keys, members)
+        ]
+        booked, capacity = grouped, np.outer(members, period_days)
+    else:
+        rows = [
+            {"product_id": int(p), "category": categories.get(int(p))}
+            for p in products
+        ]
+        capacity = np.broadcast_to(period_days, booked.shape)
+
+    rates = np.divide(booked, capacity, out=np.zeros(booked.shape), where=capacity > 0)
+    totals = booked.sum(axis=1)
+    overall = np.divide(totals, capacity.sum(axis=1), out=np.zeros(len(totals)), where=capacity.sum(axis=1) > 0)
+    for i, row in enumerate(rows):
+        row["booked_days"] = booked[i].tolist()
+        row["occupancy"] = np.round(rates[i], 4).tolist()
+        row["overall"] = round(float(overall[i]), 4)
+    # Most utilized first
+    rows.sort(key=lambda row: row["overall"], reverse=True)
+
+    return {
+        "window_start": window_start,
+        "window_end": window_end,
+        "period": period,
+        "group": group,
+        "periods": [{"start": start, "end": end} for start, end in bounds],
+        "rows": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Occupancy per product or category per week/month")
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat)
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat)
+    parser.add_argument("--period", choices=PERIODS, default="month")
+    parser.add_argument("--group", choices=GROUPS, default="category")
+    parser.add_argument("--include-blocks", action="store_true")
+    parser.add_argument("--limit", type=int, default=50, help="rows to print")
+    args = parser.parse_args()
+
+    to_date = args.to_date or date.today()
+    from_date = args.from_date or to_date - timedelta(days=intervals.DEFAULT_WINDOW_DAYS)
+    if to_date < from_date:
+        sys.exit("--to must not be before --from")
+    report = occupancy(from_date, to_date, args.period, args.group, args.include_blocks)
+
+    labels = [p["start"].isoformat() for p in report["periods"]]
+    key = "category" if args.group == "category" else "product_id"
+    print(f"{key:<24} {'overall':>8}  " + "  ".join(f"{label:>10}" for label in labels))
+    for row in report["rows"][:args.limit]:
+        cells = "  ".join(f"{rate:>10.1%}" for rate in row["occupancy"])
+        print(f"{str(row[key]):<24} {row['overall']:>8.1%}  {cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import func, literal_column
+
+import models, intervals
+
+
+def overlaps(db, window_start: date, window_end: date):
+    # Confirmed rows (bookings and admin blocks) sharing at least one day with the window.
+    # On Postgres this is a range test on the generated `period` column, answered by the
+    # partial GiST index behind the overlap constraint; elsewhere the composite btree index.
+    if db.get_bind().dialect.name == "postgresql":
+        period = literal_column("bookings.period")
+        window = func.daterange(window_start, window_end, "[]")
+        return (models.RentalBooking.status == "confirmed", period.op("&&")(window))
+    return (
+        models.RentalBooking.status == "confirmed",
+        models.RentalBooking.end_date >= window_start,
+        models.RentalBooking.start_date <= window_end,
+    )
+
+
+def busy_intervals(db, product_id: int, window_start: date, window_end: date):
+    rows = db.query(models.RentalBooking.start_date, models.RentalBooking.end_date).filter(
+        models.RentalBooking.product_id == product_id,
+        *overlaps(db, window_start, window_end)
+    ).order_by(models.RentalBooking.start_date).all()
+    return intervals.merge_intervals(rows, window_start, window_end)
+
+
+def busy_intervals_batch(db, product_ids, window_start: date, window_end: date) -> dict:
+    # Same as busy_intervals for many products, in one query
+    rows = db.query(
+        models.RentalBooking.product_id,
+        models.RentalBooking.start_date,
+        models.RentalBooking.end_date
+    ).filter(
+        models.RentalBooking.product_id.in_(product_ids),
+        *overlaps(db, window_start, window_end)
+    ).order_by(models.RentalBooking.product_id, models.RentalBooking.start_date).all()
+
+    per_product = defaultdict(list)
+    for product_id, start, end in rows:
+        per_product[product_id].append((start, end))
+    return {
+        product_id: intervals.merge_intervals(per_product.get(product_id, []), window_start, window_end)
+        for product_id in product_ids
+    }
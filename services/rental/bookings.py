@@ -0,0 +1,180 @@
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import models, availability, cache
+
+# First key of the two-int advisory lock; the second is the product id
+BOOKING_LOCK_NAMESPACE = 1011
+
+ADVISORY_LOCK_SQL = text("SELECT pg_advisory_xact_lock(:namespace, :product_id)")
+# Takes every product's lock in one round trip, in id order so two bulk writers can't deadlock
+ADVISORY_LOCK_MANY_SQL = text(
+    "SELECT pg_advisory_xact_lock(:namespace, id) "
+    "FROM (SELECT DISTINCT unnest(CAST(:product_ids AS integer[])) AS id ORDER BY id) AS ids"
+)
+
+OVERLAP_CONSTRAINT = "bookings_no_overlap"
+
+# On Postgres each row carries its inclusive day range as a generated `period` column.
+# The exclusion constraint enforces "no two confirmed rows for a product share a day"
+# itself, so no interleaving of workers (or a write path that skips the check) can
+# double-book, and its partial GiST index on (product_id, period) serves overlap queries.
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE bookings ADD COLUMN IF NOT EXISTS period daterange "
+    "GENERATED ALWAYS AS (daterange(start_date, end_date, '[]')) STORED",
+    f"""
+    DO $$
+    BEGIN
+        -- Replace the earlier expression-based constraint with one on the stored column
+        IF EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = '{OVERLAP_CONSTRAINT}' AND pg_get_constraintdef(oid) NOT LIKE '%period%'
+        ) THEN
+            ALTER TABLE bookings DROP CONSTRAINT {OVERLAP_CONSTRAINT};
+        END IF;
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{OVERLAP_CONSTRAINT}') THEN
+            ALTER TABLE bookings ADD CONSTRAINT {OVERLAP_CONSTRAINT}
+                EXCLUDE USING gist (product_id WITH =, period WITH &&)
+                WHERE (status = 'confirmed');
+        END IF;
+    END $$;
+    """,
+]
+
+
+def install(engine):
+    if engine.dialect.name != "postgresql":
+        return
+    # One transaction per statement: the period column must exist even if the
+    # constraint can't be added
+    for stmt in POSTGRES_DDL:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(stmt))
+        except Exception as e:
+            # Most likely existing overlapping rows; bookings still go through the locked check
+            print(f"Could not apply booking DDL: {e}")
+
+
+def is_overlap_violation(error: IntegrityError) -> bool:
+    # 23P01 = exclusion_violation
+    return getattr(error.orig, "pgcode", None) == "23P01" or OVERLAP_CONSTRAINT in str(error.orig)
+
+
+def lock_product(db, product_id: int):
+    # Serializes writers for one product only, released at commit/rollback
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(ADVISORY_LOCK_SQL, {"namespace": BOOKING_LOCK_NAMESPACE, "product_id": product_id})
+
+
+def lock_products(db, product_ids):
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(ADVISORY_LOCK_MANY_SQL, {"namespace": BOOKING_LOCK_NAMESPACE, "product_ids": sorted(set(product_ids))})
+
+
+def find_overlap(db, product_id: int, start_date, end_date):
+    return db.query(models.RentalBooking).filter(
+        models.RentalBooking.product_id == product_id,
+        *availability.overlaps(db, start_date, end_date)
+    ).first()
+
+
+def book(db, product_id: int, user_id: int, start_date, end_date, is_block: bool = False):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+
+    # Fast rejection from the cached day bitmap; a free answer is still confirmed under the lock
+    bitmap = cache.availability_cache.peek(product_id)
+    if bitmap is not None and bitmap.covers(start_date, end_date) and not bitmap.is_free(start_date, end_date):
+        raise HTTPException(status_code=409, detail="Item is already booked or blocked for these dates")
+
+    lock_product(db, product_id)
+    # Check if already booked OR blocked
+    existing = find_overlap(db, product_id, start_date, end_date)
+    if existing:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Item is already booked or blocked from {existing.start_date} to {existing.end_date}")
+
+    new_booking = models.RentalBooking(
+        product_id=product_id,
+        user_id=user_id,
+        start_date=start_date,
+        end_date=end_date,
+        is_block=is_block
+    )
+    db.add(new_booking)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_overlap_violation(e):
+            raise HTTPException(status_code=409, detail="Item is already booked or blocked for these dates")
+        raise
+    cache.availability_cache.mark(product_id, start_date, end_date)
+    db.refresh(new_booking)
+    return new_booking
+
+
+def book_many(db, items, user_id: int = 0, is_block: bool = True):
+    # items: (product_id, start_date, end_date) triples. Conflicts are found with one query
+    # over every product involved and the free items are inserted in one transaction.
+    # Returns one result dict per item, in order.
+    results = [
+        {"product_id": product_id, "start_date": start, "end_date": end, "status": "created"}
+        for product_id, start, end in items
+    ]
+    valid = []
+    for result in results:
+        if result["end_date"] < result["start_date"]:
+            result.update(status="invalid", detail="end_date must not be before start_date")
+        else:
+            valid.append(result)
+    if not valid:
+        return results
+
+    product_ids = {r["product_id"] for r in valid}
+    lock_products(db, product_ids)
+    rows = db.query(
+        models.RentalBooking.product_id,
+        models.RentalBooking.start_date,
+        models.RentalBooking.end_date
+    ).filter(
+        models.RentalBooking.product_id.in_(product_ids),
+        *availability.overlaps(db, min(r["start_date"] for r in valid), max(r["end_date"] for r in valid))
+    ).all()
+
+    taken = {}
+    for product_id, start, end in rows:
+        taken.setdefault(product_id, []).append((start, end))
+
+    new_rows = []
+    for result in valid:
+        product_id, start, end = result["product_id"], result["start_date"], result["end_date"]
+        clash = next(((s, e) for s, e in taken.get(product_id, ()) if s <= end and e >= start), None)
+        if clash:
+            result.update(status="conflict", detail=f"Item is already booked or blocked from {clash[0]} to {clash[1]}")
+            continue
+        # Later items in the same request conflict with this one too
+        taken.setdefault(product_id, []).append((start, end))
+        booking = models.RentalBooking(
+            product_id=product_id, user_id=user_id, start_date=start, end_date=end, is_block=is_block
+        )
+        new_rows.append((result, booking))
+
+    db.add_all(booking for _, booking in new_rows)
+    try:
+        db.flush()
+        # Read ids now; after commit every row would be reloaded one by one
+        for result, booking in new_rows:
+            result["id"] = booking.id
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if is_overlap_violation(e):
+            raise HTTPException(status_code=409, detail="Item is already booked or blocked for these dates")
+        raise
+    for result, _ in new_rows:
+        cache.availability_cache.mark(result["product_id"], result["start_date"], result["end_date"])
+    return results
@@ -0,0 +1,157 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import availability, intervals
+
+# Days covered from today on; the default keeps the whole default /availability window cached
+HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", intervals.DEFAULT_WINDOW_DAYS + 1))
+# One bitmap is HORIZON_DAYS / 8 bytes plus ~200 bytes of bookkeeping, so 50k products is ~13 MB
+CACHE_MAX_PRODUCTS = int(os.getenv("AVAILABILITY_CACHE_MAX_PRODUCTS", 50000))
+# Each worker has its own cache, so the TTL bounds how long a write made by another worker goes unseen
+CACHE_TTL_SECONDS = float(os.getenv("AVAILABILITY_CACHE_TTL_SECONDS", 60))
+
+BUSY_RUN = re.compile("1+")
+
+
+class DayBitmap:
+    # Bit i is set when day `origin + i` is booked or blocked
+    __slots__ = ("origin", "bits", "expires_at")
+
+    def __init__(self, origin: date, busy, expires_at: float):
+        self.origin = origin
+        self.bits = 0
+        self.expires_at = expires_at
+        for start, end in busy:
+            self.mark(start, end)
+
+    def _span(self, start: date, end: date):
+        return max((start - self.origin).days, 0), min((end - self.origin).days, HORIZON_DAYS - 1)
+
+    def covers(self, start: date, end: date) -> bool:
+        return self.origin <= start and (end - self.origin).days < HORIZON_DAYS
+
+    def mark(self, start: date, end: date):
+        lo, hi = self._span(start, end)
+        if lo <= hi:
+            self.bits |= ((1 << (hi - lo + 1)) - 1) << lo
+
+    def is_free(self, start: date, end: date) -> bool:
+        lo, hi = self._span(start, end)
+        return lo > hi or not (self.bits >> lo) & ((1 << (hi - lo + 1)) - 1)
+
+    def busy_intervals(self, start: date, end: date):
+        # Same result as availability.busy_intervals: runs of set bits are already merged
+        lo, hi = self._span(start, end)
+        if lo > hi:
+            return []
+        width = hi - lo + 1
+        window = (self.bits >> lo) & ((1 << width) - 1)
+        if not window:
+            return []
+        days = format(window, f"0{width}b")[::-1]
+        first = self.origin + timedelta(days=lo)
+        return [
+            (first + timedelta(days=m.start()), first + timedelta(days=m.end() - 1))
+            for m in BUSY_RUN.finditer(days)
+        ]
+
+
+class AvailabilityCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # product_id -> DayBitmap
+        self._lock = threading.Lock()
+        # Bumped on every write so bitmaps built from rows read before it are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, product_id: int, today: date):
+        bitmap = self._entries.get(product_id)
+        if bitmap is None:
+            return None
+        if bitmap.origin != today or bitmap.expires_at <= time.monotonic():
+            # Expired, or the horizon rolled over at midnight
+            del self._entries[product_id]
+            return None
+        self._entries.move_to_end(product_id)
+        return bitmap
+
+    def peek(self, product_id: int):
+        # Cached bitmap or None; never touches the database
+        with self._lock:
+            return self._lookup(product_id, date.today())
+
+    def get_many(self, db, product_ids) -> dict:
+        today = date.today()
+        found = {}
+        missing = []
+        with self._lock:
+            for product_id in product_ids:
+                bitmap = self._lookup(product_id, today)
+                if bitmap is None:
+                    missing.append(product_id)
+                else:
+                    found[product_id] = bitmap
+            self.hits += len(found)
+            self.misses += len(missing)
+            generation = self._generation
+
+        if missing:
+            # One query for every cold product
+            busy = availability.busy_intervals_batch(db, missing, today, today + timedelta(days=HORIZON_DAYS - 1))
+            expires_at = time.monotonic() + self.ttl
+            built = {product_id: DayBitmap(today, busy[product_id], expires_at) for product_id in missing}
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.update(built)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+            found.update(built)
+        return found
+
+    def mark(self, product_id: int, start: date, end: date):
+        # Call after the booking or block has committed
+        with self._lock:
+            self._generation += 1
+            bitmap = self._lookup(product_id, date.today())
+            if bitmap is not None:
+                bitmap.mark(start, end)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_products": self.maxsize,
+                "horizon_days": HORIZON_DAYS,
+                "ttl_seconds": self.ttl,
+            }
+
+
+availability_cache = AvailabilityCache(CACHE_MAX_PRODUCTS, CACHE_TTL_SECONDS)
+
+
+def busy_intervals(db, product_ids, window_start: date, window_end: date) -> dict:
+    # Merged busy intervals per product; windows inside the horizon come from the bitmaps
+    today = date.today()
+    if today <= window_start and (window_end - today).days < HORIZON_DAYS:
+        bitmaps = availability_cache.get_many(db, product_ids)
+        return {pid: bitmap.busy_intervals(window_start, window_end) for pid, bitmap in bitmaps.items()}
+    return availability.busy_intervals_batch(db, product_ids, window_start, window_end)
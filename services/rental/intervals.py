@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+# Default and maximum availability window, in days
+DEFAULT_WINDOW_DAYS = 365
+MAX_WINDOW_DAYS = 3 * 366
+
+
+def get_date_range(start: date, end: date):
+    delta = end - start
+    for i in range(delta.days + 1):
+        yield start + timedelta(days=i)
+
+
+def resolve_window(start: date = None, end: date = None):
+    start = start or date.today()
+    end = end or start + timedelta(days=DEFAULT_WINDOW_DAYS)
+    if end < start:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if (end - start).days > MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail=f"Window too large (max {MAX_WINDOW_DAYS} days)")
+    return start, end
+
+
+def merge_intervals(rows, window_start: date, window_end: date):
+    # rows: (start_date, end_date) pairs sorted by start_date, inclusive on both ends.
+    # Clips to the window and joins overlapping or back-to-back ranges.
+    merged = []
+    for start, end in rows:
+        start, end = max(start, window_start), min(end, window_end)
+        if start > end:
+            continue
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def free_intervals(busy, window_start: date, window_end: date):
+    # Complement of merged busy intervals within the window
+    free = []
+    cursor = window_start
+    for start, end in busy:
+        if start > cursor:
+            free.append((cursor, start - timedelta(days=1)))
+        cursor = max(cursor, end + timedelta(days=1))
+    if cursor <= window_end:
+        free.append((cursor, window_end))
+    return free
+
+
+def count_days(intervals) -> int:
+    return sum((end - start).days + 1 for start, end in intervals)
@@ -1,12 +1,13 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, status, Query
 from sqlalchemy.orm import Session
-from typing import List
-from datetime import timedelta, date
+from typing import List, Optional
+from datetime import date, timedelta
 from fastapi.middleware.cors import CORSMiddleware
 
-import models, schemas, database
+import models, schemas, database, intervals, bookings, cache, analytics, tokens
 
 models.Base.metadata.create_all(bind=database.engine)
+bookings.install(database.engine)
 
 app = FastAPI(title="Rental Service")
 
@@ -18,66 +19,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def get_date_range(start: date, end: date):
-    delta = end - start
-    for i in range(delta.days + 1):
-        yield start + timedelta(days=i)
-
 @app.post("/bookings", response_model=schemas.BookingResponse, status_code=status.HTTP_201_CREATED)
-def create_booking(booking: schemas.BookingCreate, db: Session = Depends(database.get_db)):
-    # Check if already booked OR blocked
-    existing = db.query(models.RentalBooking).filter(
-        models.RentalBooking.product_id == booking.product_id,
-        models.RentalBooking.end_date >= booking.start_date,
-        models.RentalBooking.start_date <= booking.end_date,
-        models.RentalBooking.status == "confirmed"
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail=f"Item is already booked or blocked from {existing.start_date} to {existing.end_date}")
-
-
-    new_booking = models.RentalBooking(**booking.dict())
-    db.add(new_booking)
-    db.commit()
-    db.refresh(new_booking)
-    return new_booking
+def create_booking(
+    booking: schemas.BookingCreate,
+    claims: dict = Depends(tokens.get_current_user),
+    db: Session = Depends(database.get_db)
+):
+    tokens.ensure_same_user(claims, booking.user_id)
+    return bookings.book(db, booking.product_id, booking.user_id, booking.start_date, booking.end_date)
 
 @app.post("/blocks", response_model=schemas.BookingResponse, status_code=status.HTTP_201_CREATED)
 def create_block(block: schemas.BlockCreate, db: Session = Depends(database.get_db)):
-    new_block = models.RentalBooking(
-        product_id=block.product_id,
-        start_date=block.start_date,
-        end_date=block.end_date,
-        user_id=0, # 0 indicates system/admin block
-        is_block=True
-    )
-    db.add(new_block)
-    db.commit()
-    db.refresh(new_block)
-    return new_block
-
-@app.get("/availability/{product_id}")
-def check_availability(product_id: int, db: Session = Depends(database.get_db)):
-    # Include both confirmed regular bookings and admin blocks
-    bookings = db.query(models.RentalBooking).filter(
-        models.RentalBooking.product_id == product_id,
-        models.RentalBooking.status == "confirmed"
-    ).all()
-    
-    booked_dates = []
-    for booking in bookings:
-        for single_date in get_date_range(booking.start_date, booking.end_date):
-            booked_dates.append(single_date)
-            
-    # Sort and remove duplicates
-    unique_dates = sorted(list(set(booked_dates)))
-            
-    return {
-        "product_id": product_id, 
-        "booked_dates": unique_dates,
-        "count": len(unique_dates)
+    # user_id 0 indicates system/admin block
+    return bookings.book(db, block.product_id, 0, block.start_date, block.end_date, is_block=True)
+
+@app.post("/blocks/bulk", response_model=schemas.BulkBlockResponse, response_model_exclude_none=True)
+def create_blocks_bulk(bulk: schemas.BulkBlockCreate, db: Session = Depends(database.get_db)):
+    # One transaction for the whole list; conflicting items are reported, the rest are created
+    results = bookings.book_many(db, [(b.product_id, b.start_date, b.end_date) for b in bulk.blocks])
+    created = sum(1 for r in results if r["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+@app.get("/availability/{product_id}", response_model=schemas.AvailabilityResponse, response_model_exclude_none=True)
+def check_availability(
+    product_id: int,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    include_dates: bool = False,
+    db: Session = Depends(database.get_db)
+):
+    window_start, window_end = intervals.resolve_window(from_date, to_date)
+    busy = cache.busy_intervals(db, [product_id], window_start, window_end)[product_id]
+    response = {
+        "product_id": product_id,
+        "window_start": window_start,
+        "window_end": window_end,
+        "busy": [{"start": start, "end": end} for start, end in busy],
+        "count": intervals.count_days(busy),
     }
+    if include_dates:
+        response["booked_dates"] = [d for start, end in busy for d in intervals.get_date_range(start, end)]
+    return response
+
+
+@app.post("/availability/batch", response_model=schemas.BatchAvailabilityResponse)
+def check_availability_batch(batch: schemas.BatchAvailabilityRequest, db: Session = Depends(database.get_db)):
+    window_start, window_end = intervals.resolve_window(batch.start_date, batch.end_date)
+    product_ids = list(dict.fromkeys(batch.product_ids))
+    busy_by_product = cache.busy_intervals(db, product_ids, window_start, window_end)
+
+    products = []
+    for product_id in product_ids:
+        busy = busy_by_product[product_id]
+        products.append({
+            "product_id": product_id,
+            "available": not busy,
+            "busy": [{"start": start, "end": end} for start, end in busy],
+            "free": [
+                {"start": start, "end": end}
+                for start, end in intervals.free_intervals(busy, window_start, window_end)
+            ],
+        })
+    return {"window_start": window_start, "window_end": window_end, "products": products}
+
+
+@app.get("/analytics/occupancy", response_model=schemas.OccupancyResponse, response_model_exclude_none=True)
+def occupancy_report(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    period: str = Query("month", pattern="^(week|month)$"),
+    group: str = Query("product", pattern="^(product|category)$"),
+    include_blocks: bool = False
+):
+    # Defaults to the past year; reads its own snapshot, not the request session
+    to_date = to_date or date.today()
+    from_date = from_date or to_date - timedelta(days=intervals.DEFAULT_WINDOW_DAYS)
+    window_start, window_end = intervals.resolve_window(from_date, to_date)
+    return analytics.occupancy(window_start, window_end, period, group, include_blocks)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return cache.availability_cache.stats()
 
 
 @app.get("/health")
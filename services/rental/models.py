@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, String, Boolean
+from sqlalchemy import Column, Integer, Date, String, Boolean, Index, text
 from database import Base
 
 class RentalBooking(Base):
@@ -11,3 +11,13 @@ class RentalBooking(Base):
     end_date = Column(Date)
     status = Column(String, default="confirmed") # confirmed, cancelled
     is_block = Column(Boolean, default=False)
+
+    __table_args__ = (
+        # Overlap lookups for one product only ever want confirmed rows. SQLite only: on
+        # Postgres the GiST index behind bookings_no_overlap (see bookings.py) serves them,
+        # and a second index would just be maintained on every booking write
+        Index(
+            "ix_bookings_confirmed_product_end_start", "product_id", "end_date", "start_date",
+            sqlite_where=text("status = 'confirmed'"),
+        ).ddl_if(dialect="sqlite"),
+    )
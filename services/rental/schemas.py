@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 class BookingBase(BaseModel):
     product_id: int
@@ -28,6 +28,69 @@ class BlockCreate(BaseModel):
     start_date: date
     end_date: date
 
+class BulkBlockCreate(BaseModel):
+    blocks: List[BlockCreate] = Field(..., min_length=1, max_length=5000)
+
+class BlockResult(BaseModel):
+    product_id: int
+    start_date: date
+    end_date: date
+    # created, conflict or invalid
+    status: str
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BulkBlockResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BlockResult]
+
+class DateInterval(BaseModel):
+    start: date
+    end: date
+
 class AvailabilityResponse(BaseModel):
     product_id: int
-    booked_dates: List[date]
+    window_start: date
+    window_end: date
+    busy: List[DateInterval]
+    count: int
+    # Only filled when the caller asks for per-day output
+    booked_dates: Optional[List[date]] = None
+
+class BatchAvailabilityRequest(BaseModel):
+    product_ids: List[int] = Field(..., min_length=1, max_length=500)
+    # Defaults to today through one year ahead
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class ProductAvailability(BaseModel):
+    product_id: int
+    # True when the product is free for the whole window
+    available: bool
+    busy: List[DateInterval]
+    free: List[DateInterval]
+
+class BatchAvailabilityResponse(BaseModel):
+    window_start: date
+    window_end: date
+    products: List[ProductAvailability]
+
+class OccupancyRow(BaseModel):
+    # Set when grouping by product
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+    # Set when grouping by category: how many products share the capacity
+    products: Optional[int] = None
+    # One entry per period
+    booked_days: List[int]
+    occupancy: List[float]
+    overall: float
+
+class OccupancyResponse(BaseModel):
+    window_start: date
+    window_end: date
+    period: str
+    group: str
+    periods: List[DateInterval]
+    rows: List[OccupancyRow]
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+
+# Verifies access tokens issued by the auth service without calling it. Same settings as
+# auth: JWT_SECRET_KEY is the current HS256 key, named JWT_KEY_ID in token headers.
+# During a rotation, JWT_PREVIOUS_KEYS ("kid=secret,...") keeps older tokens valid, and
+# JWT_PUBLIC_KEYS ("kid=/path/to/public.pem,...") adds RS256 keys. Keys are read at startup.
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecretkey")
+JWT_KEY_ID = os.getenv("JWT_KEY_ID", "default")
+CLAIMS_CACHE_SIZE = int(os.getenv("JWT_CLAIMS_CACHE_SIZE", 10000))
+
+
+def parse_pairs(spec: str):
+    for item in spec.split(","):
+        if item.strip():
+            kid, _, value = item.strip().partition("=")
+            yield kid, value
+
+
+def load_keys() -> dict:
+    # kid -> (algorithm, key)
+    keys = {JWT_KEY_ID: ("HS256", JWT_SECRET_KEY)}
+    for kid, secret in parse_pairs(os.getenv("JWT_PREVIOUS_KEYS", "")):
+        keys.setdefault(kid, ("HS256", secret))
+    for kid, path in parse_pairs(os.getenv("JWT_PUBLIC_KEYS", "")):
+        with open(path) as f:
+            keys[kid] = ("RS256", f.read())
+    return keys
+
+
+def unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+class TokenVerifier:
+    def __init__(self, keys: dict, maxsize: int):
+        self.maxsize = maxsize
+        self._keys = keys
+        self._claims = OrderedDict()  # token -> (exp, claims)
+        self._lock = threading.Lock()
+
+    def verify(self, token: str) -> dict:
+        now = time.time()
+        with self._lock:
+            entry = self._claims.get(token)
+            if entry is not None and entry[0] > now:
+                self._claims.move_to_end(token)
+                return entry[1]
+            if entry is not None:
+                del self._claims[token]
+
+        claims = self._decode(token)
+
+        with self._lock:
+            # Cached until the token itself expires
+            self._claims[token] = (claims["exp"], claims)
+            while len(self._claims) > self.maxsize:
+                self._claims.popitem(last=False)
+        return claims
+
+    def _decode(self, token: str) -> dict:
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            raise unauthorized("Invalid token")
+        # Tokens issued before key ids were added belong to the current key
+        key = self._keys.get(header.get("kid", JWT_KEY_ID))
+        if key is None:
+            raise unauthorized("Unknown signing key")
+        algorithm, secret = key
+        try:
+            # The key decides the algorithm, never the token header
+            return jwt.decode(token, secret, algorithms=[algorithm], options={"require_exp": True})
+        except JWTError:
+            raise unauthorized("Invalid or expired token")
+
+
+verifier = TokenVerifier(load_keys(), CLAIMS_CACHE_SIZE)
+bearer = HTTPBearer(auto_error=False)
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer)) -> dict:
+    if credentials is None:
+        raise unauthorized("Not authenticated")
+    return verifier.verify(credentials.credentials)
+
+
+def ensure_same_user(claims: dict, user_id: int):
+    # Bodies still carry user_id; it has to be the caller's own unless they are an admin
+    if claims.get("user_id") != user_id and not claims.get("is_admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token does not match user_id")